@@ -0,0 +1,262 @@
+"""
+Benchmarks reprodutíveis das etapas do pipeline.
+
+Gera fixtures sintéticas de áudio e vídeo (sinal determinístico), mede tempo de
+parede, tempo de CPU e pico de memória de cada etapa em um processo isolado e
+grava os resultados em JSON. Com --compare, compara com um baseline salvo e
+sai com código 1 se alguma etapa regrediu além do limite.
+
+Exemplos:
+    python benchmarks/run_benchmarks.py --preset quick --output bench.json
+    python benchmarks/run_benchmarks.py --preset standard --compare bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+SRC_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.insert(0, SRC_FOLDER)
+
+PRESETS = {
+    'quick': [10],
+    'standard': [10, 600],
+    'full': [10, 600, 7200],
+}
+
+STAGES = [
+    'extract_audio',
+    'calculate_metrics',
+    'generate_spectrogram',
+    'enhance_audio',
+    'convert_audio_to_mp3',
+    'treat_audio_concurrently',
+]
+
+# Arquivos tratados em paralelo no benchmark de treat_audio_concurrently
+TREAT_FILES = 4
+# Amostras geradas por vez ao escrever as fixtures, para não depender da duração
+FIXTURE_BLOCK = 1 << 20
+
+def generate_signal(start, length, sr, channels):
+    import numpy as np
+    # Varredura senoidal com ruído semeado pela posição: o mesmo arquivo em qualquer máquina
+    t = (start + np.arange(length)) / sr
+    tone = 0.3 * np.sin(2 * np.pi * (200 + 50 * np.sin(2 * np.pi * 0.1 * t)) * t)
+    rng = np.random.default_rng(start)
+    noise = 0.02 * rng.standard_normal((length, channels))
+    return (tone[:, None] + noise).astype(np.float32)
+
+def create_audio_fixture(path, duration, sr, channels):
+    import soundfile as sf
+    if os.path.exists(path):
+        return path
+    total = int(duration * sr)
+    with sf.SoundFile(path + '.part', 'w', samplerate=sr, channels=channels, subtype='PCM_16', format='WAV') as f:
+        for start in range(0, total, FIXTURE_BLOCK):
+            f.write(generate_signal(start, min(FIXTURE_BLOCK, total - start), sr, channels))
+    os.replace(path + '.part', path)
+    return path
+
+def create_video_fixture(path, duration, sr, channels):
+    import ffmpeg
+    if os.path.exists(path):
+        return path
+    video = ffmpeg.input(f'color=c=black:s=160x120:r=5:d={duration}', f='lavfi')
+    audio = ffmpeg.input(f'sine=frequency=440:sample_rate={sr}:duration={duration}', f='lavfi')
+    (
+        ffmpeg
+        .output(video, audio, path + '.part.mp4', vcodec='libx264', preset='ultrafast', acodec='aac', ac=channels, shortest=None)
+        .overwrite_output()
+        .run(quiet=True)
+    )
+    os.replace(path + '.part.mp4', path)
+    return path
+
+def current_rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def peak_rss_mb(who):
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def prepare_stage(stage, fixtures, work_folder):
+    # Tudo o que não deve entrar na medição: imports, leitura do arquivo, pastas
+    import librosa
+    from enhancer import AudioProcessor
+
+    if stage == 'extract_audio':
+        from extractor import extract_audio
+        video_folder = os.path.join(work_folder, 'videos')
+        os.makedirs(video_folder)
+        os.symlink(fixtures['video'], os.path.join(video_folder, 'fixture.mp4'))
+        return lambda: extract_audio(video_folder, os.path.join(work_folder, 'staging'), force=True)
+
+    if stage == 'convert_audio_to_mp3':
+        from main import convert_audio_to_mp3
+        audio_folder = os.path.join(work_folder, 'staging')
+        os.makedirs(audio_folder)
+        os.symlink(fixtures['audio'], os.path.join(audio_folder, 'fixture.wav'))
+        return lambda: convert_audio_to_mp3(audio_folder, os.path.join(work_folder, 'converted'))
+
+    if stage == 'treat_audio_concurrently':
+        from main import treat_audio_concurrently
+        audio_folder = os.path.join(work_folder, 'staging')
+        os.makedirs(audio_folder)
+        for i in range(TREAT_FILES):
+            os.symlink(fixtures['audio'], os.path.join(audio_folder, f'fixture_{i}.wav'))
+        return lambda: treat_audio_concurrently(audio_folder, os.path.join(work_folder, 'treated'), AudioProcessor())
+
+    y, sr = librosa.load(fixtures['audio'], sr=None)
+    if stage == 'calculate_metrics':
+        from analyzer import calculate_metrics
+        return lambda: calculate_metrics(y, sr)
+    if stage == 'generate_spectrogram':
+        from analyzer import generate_spectrogram
+        return lambda: generate_spectrogram(y, sr, os.path.join(work_folder, 'spectrogram.png'))
+    if stage == 'enhance_audio':
+        from analyzer import calculate_metrics
+        metrics = calculate_metrics(y, sr)
+        return lambda: AudioProcessor().enhance_audio(y, sr, metrics, os.path.join(work_folder, 'treated.mp3'))
+    raise ValueError(f"Etapa desconhecida: {stage}")
+
+def measure_stage(stage, fixtures, work_folder, queue):
+    # Executado em um processo novo, para que o pico de memória seja só desta etapa
+    run = prepare_stage(stage, fixtures, work_folder)
+    rss_before = current_rss_mb()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    run()
+    cpu = time.process_time() - cpu_start
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    queue.put({
+        'wall_s': time.perf_counter() - wall_start,
+        'cpu_s': cpu + children.ru_utime + children.ru_stime,
+        'peak_rss_mb': peak_rss_mb(resource.RUSAGE_SELF),
+        'stage_peak_mb': max(0.0, peak_rss_mb(resource.RUSAGE_SELF) - rss_before),
+        'children_peak_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN),
+    })
+
+def run_case(stage, fixtures, work_folder):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=measure_stage, args=(stage, fixtures, work_folder, queue))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return {'error': f'processo terminou com código {process.exitcode}'}
+    return queue.get()
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=SRC_FOLDER, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(durations, sample_rates, channel_counts, stages, fixtures_folder, repeat):
+    os.makedirs(fixtures_folder, exist_ok=True)
+    results = []
+    for duration in durations:
+        for sr in sample_rates:
+            for channels in channel_counts:
+                name = f'{duration}s_{sr}hz_{channels}ch'
+                print(f"Gerando fixtures {name}...")
+                fixtures = {
+                    'audio': create_audio_fixture(os.path.join(fixtures_folder, f'{name}.wav'), duration, sr, channels),
+                    'video': create_video_fixture(os.path.join(fixtures_folder, f'{name}.mp4'), duration, sr, channels)
+                    if 'extract_audio' in stages else None,
+                }
+                for stage in stages:
+                    for attempt in range(repeat):
+                        work_folder = os.path.join(fixtures_folder, 'work', f'{stage}_{name}_{attempt}')
+                        shutil.rmtree(work_folder, ignore_errors=True)
+                        os.makedirs(work_folder)
+                        result = run_case(stage, fixtures, work_folder)
+                        shutil.rmtree(work_folder, ignore_errors=True)
+                        result.update({'stage': stage, 'duration': duration, 'sample_rate': sr, 'channels': channels, 'attempt': attempt})
+                        print(f"{stage:<26} {name:<20} " + (f"{result['wall_s']:8.2f}s {result['peak_rss_mb']:8.1f} MB" if 'error' not in result else result['error']))
+                        results.append(result)
+    return results
+
+def summarize(results):
+    # Com várias repetições, usa o melhor tempo e o maior pico de memória
+    summary = {}
+    for result in results:
+        if 'error' in result:
+            continue
+        key = (result['stage'], result['duration'], result['sample_rate'], result['channels'])
+        if key not in summary:
+            summary[key] = dict(result)
+        else:
+            summary[key]['wall_s'] = min(summary[key]['wall_s'], result['wall_s'])
+            summary[key]['peak_rss_mb'] = max(summary[key]['peak_rss_mb'], result['peak_rss_mb'])
+    return summary
+
+def compare(results, baseline, threshold):
+    current = summarize(results)
+    previous = summarize(baseline['results'])
+    regressions = []
+    for key, result in sorted(current.items()):
+        if key not in previous:
+            continue
+        for field in ('wall_s', 'peak_rss_mb'):
+            before, after = previous[key][field], result[field]
+            change = (after - before) / before if before else 0.0
+            flag = 'REGRESSÃO' if change > threshold else ''
+            print(f"{key[0]:<26} {key[1]:>6}s {key[2]:>6}Hz {key[3]}ch {field:<12} {before:10.2f} -> {after:10.2f} ({change:+.1%}) {flag}")
+            if flag:
+                regressions.append((key, field, change))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks das etapas do pipeline de áudio')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick', help='durações das fixtures')
+    parser.add_argument('--durations', type=lambda value: [int(v) for v in value.split(',')], help='durações em segundos, ex.: 10,600')
+    parser.add_argument('--sample-rates', type=lambda value: [int(v) for v in value.split(',')], default=[22050, 44100])
+    parser.add_argument('--channels', type=lambda value: [int(v) for v in value.split(',')], default=[1, 2])
+    parser.add_argument('--stages', type=lambda value: value.split(','), default=STAGES)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--fixtures', default=os.path.join(os.path.dirname(__file__), 'fixtures'))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='arquivo JSON de baseline para detectar regressões')
+    parser.add_argument('--threshold', type=float, default=0.2, help='aumento relativo tolerado (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"etapas desconhecidas: {', '.join(sorted(unknown))}")
+
+    results = run_benchmarks(args.durations or PRESETS[args.preset], args.sample_rates, args.channels,
+                             args.stages, args.fixtures, args.repeat)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados salvos em {args.output}")
+
+    failed = [result for result in results if 'error' in result]
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
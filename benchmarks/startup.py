@@ -0,0 +1,98 @@
+"""
+Tempo de inicialização dos pontos de entrada.
+
+Importa cada módulo (main, cli, app) em um interpretador novo, mede o tempo de
+importação descontando a partida do Python e lista as dependências pesadas
+que foram carregadas. Sai com código 1 se algum ponto de entrada passar do
+orçamento ou carregar uma dependência pesada na importação.
+
+Exemplos:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --repeat 10 --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+
+# Orçamento de importação por ponto de entrada, em segundos
+BUDGETS = {
+    'main': 0.5,
+    'cli': 0.5,
+    'app': 1.5,
+}
+
+# Só devem ser importados no primeiro uso
+HEAVY_MODULES = ('noisereduce', 'scipy.signal', 'matplotlib', 'numba', 'librosa.core', 'librosa.display')
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'import_s': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure_import(module, repeat):
+    # Melhor de `repeat` execuções, cada uma em um processo novo (sem cache de módulos)
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-c', MEASURE.format(module=module, heavy=HEAVY_MODULES)],
+                                   cwd=SRC_FOLDER, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'falhou'}
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        if best is None or result['import_s'] < best['import_s']:
+            best = result
+    return best
+
+def slowest_imports(module, top):
+    # Maiores tempos acumulados segundo o -X importtime do Python
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=SRC_FOLDER, capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tempo de importação dos pontos de entrada')
+    parser.add_argument('--modules', type=lambda value: value.split(','), default=sorted(BUDGETS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=0, help='mostra as N importações mais lentas de cada módulo')
+    parser.add_argument('--output', help='grava os resultados em JSON')
+    args = parser.parse_args(argv)
+
+    results = {}
+    failed = False
+    for module in args.modules:
+        result = measure_import(module, args.repeat)
+        result['budget_s'] = BUDGETS.get(module)
+        results[module] = result
+        if 'error' in result:
+            # Ex.: app sem o streamlit instalado; não conta como estouro de orçamento
+            print(f"{module:<6} indisponível: {result['error']}")
+            continue
+        over = result['budget_s'] is not None and result['import_s'] > result['budget_s']
+        flag = 'ACIMA DO ORÇAMENTO' if over else ''
+        if result['loaded']:
+            flag = (flag + ' carregou: ' + ', '.join(result['loaded'])).strip()
+        failed = failed or over or bool(result['loaded'])
+        budget = f"{result['budget_s']:.2f}s" if result['budget_s'] is not None else '-'
+        print(f"{module:<6} {result['import_s']:7.3f}s  (orçamento {budget}) {flag}")
+        for cumulative, name in slowest_imports(module, args.top) if args.top else []:
+            print(f"         {cumulative:7.3f}s  {name}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,7 +4,7 @@ import librosa
 import numpy as np
 import noisereduce as nr
 from scipy.io.wavfile import write
-import matplotlib.pyplot as plt
+from spectrogram import figure_renderer
 
 def extract_audio(input_folder, output_folder):
     if not os.path.exists(input_folder):
@@ -38,19 +38,12 @@ def save_audio_analysis(audio_path, analysis_folder, stage=''):
     y, sr = librosa.load(audio_path, sr=None)
     S_full, phase = librosa.magphase(librosa.stft(y))
 
-    plt.figure(figsize=(10, 4))
-    librosa.display.specshow(librosa.amplitude_to_db(S_full, ref=np.max), y_axis='log', x_axis='time')
-    plt.title(f'Espectrograma {stage}')
-    plt.colorbar(format='%+2.0f dB')
-    plt.tight_layout()
-
     if not os.path.exists(analysis_folder):
         os.makedirs(analysis_folder)
 
     # Salva o espectrograma como uma imagem
     image_path = os.path.join(analysis_folder, os.path.splitext(os.path.basename(audio_path))[0] + f'_{stage}_spectrogram.png')
-    plt.savefig(image_path)
-    plt.close()
+    figure_renderer().render(S_full, sr, image_path, title=f'Espectrograma {stage}')
     print(f"Espectrograma salvo como {image_path}")
 
     return y, sr, S_full, phase
@@ -1,20 +1,177 @@
 import librosa
 import numpy as np
-import matplotlib.pyplot as plt
 import soundfile as sf
 import os
+import shutil
+from config import streaming_min_duration, streaming_block_length, spectrogram_renderer, spectrogram_width, spectrogram_height
+from instrumentation import span
+from spectrogram import render_spectrogram, figure_renderer
+from loudness import LoudnessMeter, ABSOLUTE_GATE
+from wavmap import load_audio, open_audio
 
-def calculate_metrics(y, sr):
+# Parâmetros da STFT compartilhada (os mesmos padrões do librosa)
+N_FFT = 2048
+HOP_LENGTH = 512
+# Valor gravado como true peak de um sinal totalmente silencioso (dBTP)
+SILENCE_PEAK_DB = -120.0
+# Muda sempre que o conjunto de métricas muda, invalidando as análises em cache
+METRICS_VERSION = 2
+
+def compute_spectrogram(y, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    # Espectrograma de magnitude calculado uma única vez por arquivo
+    return np.abs(librosa.stft(np.asarray(y), n_fft=n_fft, hop_length=hop_length))
+
+def spectral_metrics_frames(S, sr, roll_percent=0.85):
+    """
+    Métricas espectrais por quadro (..., quadros), com as definições do librosa
+    (centróide, largura de banda com p=2, planura e roll-off). Centróide e
+    largura de banda saem dos três primeiros momentos de cada coluna, um único
+    produto de matrizes, em vez de uma matriz de desvios do tamanho de S.
+    """
+    freq = librosa.fft_frequencies(sr=sr, n_fft=2 * (S.shape[-2] - 1))
+    moments = np.stack([np.ones_like(freq), freq, freq ** 2]) @ S
+    # Colunas de energia nula não são normalizadas, como em librosa.util.normalize
+    total = moments[..., 0, :]
+    m0, m1, m2 = np.moveaxis(moments / np.where(total < np.finfo(S.dtype).tiny, 1.0, total)[..., None, :], -2, 0)
+    cumulative = np.cumsum(S, axis=-2)
+    rolloff = np.argmax(cumulative >= roll_percent * cumulative[..., -1:, :], axis=-2)
+    return {
+        'Spectral Centroid': m1,
+        'Spectral Bandwidth': np.sqrt(np.maximum(m2 - 2 * m1 * m1 + m1 * m1 * m0, 0.0)),
+        'Spectral Flatness': librosa.feature.spectral_flatness(S=S)[..., 0, :],
+        'Spectral Roll-off': freq[rolloff],
+    }
+
+def zero_crossing_rate(y, frame_length=N_FFT, hop_length=HOP_LENGTH, threshold=1e-10):
+    # librosa.feature.zero_crossing_rate (center=True, bordas repetidas) por soma
+    # acumulada dos cruzamentos, sem enquadrar o sinal
+    y = np.asarray(y)
+    negative = y < -np.asarray(threshold, dtype=y.dtype)
+    padding = [(0, 0)] * (y.ndim - 1) + [(frame_length // 2, frame_length // 2)]
+    negative = np.pad(negative, padding, mode='edge')
+    crossings = np.zeros(negative.shape, dtype=np.int64)
+    np.cumsum(negative[..., 1:] != negative[..., :-1], axis=-1, out=crossings[..., 1:])
+    starts = np.arange(1 + y.shape[-1] // hop_length) * hop_length
+    return (crossings[..., starts + frame_length - 1] - crossings[..., starts]) / frame_length
+
+def spectral_metrics(S, sr):
+    # Todas as métricas espectrais derivadas do mesmo espectrograma, sem novas STFTs
+    return {key: np.mean(values) for key, values in spectral_metrics_frames(S, sr).items()}
+
+def loudness_metrics(integrated, true_peak):
+    # Silêncio é gravado com valores finitos: a porta absoluta e SILENCE_PEAK_DB
+    return {
+        'Integrated Loudness': max(float(integrated), ABSOLUTE_GATE),
+        'True Peak': max(float(true_peak), SILENCE_PEAK_DB),
+    }
+
+def calculate_metrics(y, sr, S=None):
+    # y pode ter vários canais (canais, amostras), como no librosa: a loudness
+    # é medida nos canais originais e as demais métricas no sinal mono
     y = np.array(y)  # Ensure y is a numpy array
+    channels = y.reshape(-1, y.shape[-1]).T
+    if y.ndim > 1:
+        y = librosa.to_mono(y)
+    if S is None:
+        S = compute_spectrogram(y)
     metrics = {}
     metrics['RMS Desvio'] = np.sqrt(np.mean(y**2))
-    metrics['Zero Crossing Rate'] = np.mean(librosa.feature.zero_crossing_rate(y))
-    metrics['Spectral Centroid'] = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
-    metrics['Spectral Bandwidth'] = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
-    metrics['Spectral Flatness'] = np.mean(librosa.feature.spectral_flatness(y=y))
-    metrics['Spectral Roll-off'] = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
+    metrics['Zero Crossing Rate'] = np.mean(zero_crossing_rate(y))
+    metrics.update(spectral_metrics(S, sr))
+    meter = LoudnessMeter(sr, channels.shape[1])
+    meter.process(channels)
+    metrics.update(loudness_metrics(meter.integrated_loudness(), meter.true_peak()))
     return metrics
 
+def _read_blocks(input_file, blocksize):
+    # Lê o arquivo em blocos com todos os canais; a média dá o mono do librosa.load.
+    # WAVs sem compressão são mapeados em memória e convertidos bloco a bloco
+    with open_audio(input_file) as f:
+        yield from f.blocks(blocksize, dtype='float32', always_2d=True)
+
+def stream_audio_features(input_file, block_length=streaming_block_length, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """
+    Calcula as métricas de calculate_metrics lendo o arquivo em blocos.
+
+    Os quadros são os mesmos da versão em memória (mesmo padding centralizado),
+    então a única diferença vem da ordem de acumulação das médias: a diferença
+    relativa para calculate_metrics fica abaixo de 1e-4. A memória usada depende
+    apenas de block_length; o espectrograma retornado tem uma coluna (magnitude
+    média) por bloco de block_length quadros. A loudness e o true peak são
+    medidos na mesma passada, sobre os canais originais.
+
+    :param input_file: Caminho do arquivo de áudio.
+    :param block_length: Número de quadros da STFT processados por bloco.
+    :return: Tupla (sr, metrics, S_blocks).
+    """
+    info = sf.info(input_file)
+    sr = info.samplerate
+    meter = LoudnessMeter(sr, info.channels)
+    pad = n_fft // 2
+    segment_length = n_fft + (block_length - 1) * hop_length
+
+    sums = {'Zero Crossing Rate': 0.0, 'Spectral Centroid': 0.0, 'Spectral Bandwidth': 0.0,
+            'Spectral Flatness': 0.0, 'Spectral Roll-off': 0.0}
+    n_frames = 0
+    sum_squares = 0.0
+    n_samples = 0
+    columns = []
+
+    # buf guarda o sinal com padding de zeros; offset é a posição absoluta de buf[0]
+    buf = np.zeros(0, dtype=np.float32)
+    offset = 0
+    first_sample = last_sample = 0.0
+    total_length = None
+
+    def process(segment):
+        nonlocal n_frames
+        # O zero crossing rate do librosa usa padding por repetição das bordas
+        zcr_segment = segment.copy()
+        left = min(max(pad - offset, 0), len(segment))
+        zcr_segment[:left] = first_sample
+        if total_length is not None:
+            right = max(pad + total_length - offset, left)
+            zcr_segment[right:] = last_sample
+
+        S = np.abs(librosa.stft(segment, n_fft=n_fft, hop_length=hop_length, center=False))
+        zcr = librosa.feature.zero_crossing_rate(zcr_segment, frame_length=n_fft, hop_length=hop_length, center=False)
+        features = spectral_metrics(S, sr)
+        frames = S.shape[1]
+        sums['Zero Crossing Rate'] += float(np.mean(zcr)) * frames
+        for key, value in features.items():
+            sums[key] += float(value) * frames
+        n_frames += frames
+        columns.append(S.mean(axis=1))
+        return frames
+
+    for i, block in enumerate(_read_blocks(input_file, block_length * hop_length)):
+        meter.process(block)
+        block = block.mean(axis=1)
+        if i == 0:
+            first_sample = block[0]
+            block = np.concatenate([np.zeros(pad, dtype=np.float32), block])
+        sum_squares += float(np.sum(block.astype(np.float64) ** 2))
+        n_samples += len(block) - (pad if i == 0 else 0)
+        last_sample = block[-1]
+        buf = np.concatenate([buf, block])
+        while len(buf) >= segment_length:
+            frames = process(buf[:segment_length])
+            buf = buf[frames * hop_length:]
+            offset += frames * hop_length
+
+    # Último trecho: completa com o padding final e processa os quadros restantes
+    total_length = n_samples
+    buf = np.concatenate([buf, np.zeros(pad, dtype=np.float32)])
+    if len(buf) >= n_fft:
+        remaining = 1 + (len(buf) - n_fft) // hop_length
+        process(buf[:(remaining - 1) * hop_length + n_fft])
+
+    metrics = {'RMS Desvio': np.sqrt(sum_squares / n_samples)}
+    for key, value in sums.items():
+        metrics[key] = value / n_frames
+    metrics.update(loudness_metrics(meter.integrated_loudness(), meter.true_peak()))
+    return sr, metrics, np.stack(columns, axis=1)
+
 def save_metrics(metrics, filepath):
     with open(filepath, 'w') as f:
         for key, value in metrics.items():
@@ -22,37 +179,99 @@ def save_metrics(metrics, filepath):
                 value = value.tolist()  # Convertendo array numpy para lista
             f.write(f'{key}: {value}\n')
 
-def generate_spectrogram(y, sr, filepath):
-    plt.figure(figsize=(10, 4))
-    D = librosa.amplitude_to_db(np.abs(librosa.stft(y)), ref=np.max)
-    librosa.display.specshow(D, sr=sr, x_axis='time', y_axis='log')
-    plt.colorbar(format='%+2.0f dB')
-    plt.title('Spectrogram')
-    plt.tight_layout()
-    plt.savefig(filepath)
-    plt.close()
+def generate_spectrogram(y, sr, filepath, S=None, hop_length=HOP_LENGTH, renderer=None):
+    if S is None:
+        S = compute_spectrogram(y)
+    renderer = renderer or spectrogram_renderer
+    if renderer == 'fast':
+        render_spectrogram(S, filepath, width=spectrogram_width, height=spectrogram_height)
+    elif renderer == 'figure':
+        figure_renderer().render(S, sr, filepath, hop_length=hop_length, width=spectrogram_width, height=spectrogram_height)
+    else:
+        raise ValueError(f"Renderizador de espectrograma desconhecido: {renderer}")
 
 def analyze_audio_for_parameters(audio_path):
-    y, sr = librosa.load(audio_path, sr=None)
+    with span('decode', file=audio_path):
+        y, sr = load_audio(audio_path)
     
-    # Calculando métricas
-    metrics = {
-        'Zero Crossing Rate': np.mean(librosa.feature.zero_crossing_rate(y=y)),
-        'Spectral Centroid': np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)),
-        'Spectral Bandwidth': np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr)),
-        'Spectral Flatness': np.mean(librosa.feature.spectral_flatness(y=y)),
-        'Spectral Roll-off': np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr)),
-        'RMS': np.mean(librosa.feature.rms(y=y))
-    }
+    # Calculando métricas a partir de uma única STFT
+    with span('metrics', file=audio_path):
+        S = compute_spectrogram(y)
+        metrics = {'Zero Crossing Rate': np.mean(librosa.feature.zero_crossing_rate(y=y))}
+        metrics.update(spectral_metrics(S, sr))
+        metrics['RMS'] = np.mean(librosa.feature.rms(y=y))
     
     return y, sr, metrics
 
-def save_audio_analysis(input_file, output_folder, stage='original'):
-    y, sr = librosa.load(input_file, sr=None)
+def save_array_analysis(y, sr, input_file, output_folder, stage='original', write_txt=True):
+    # Análise de um sinal já decodificado (modo fundido): uma STFT para métricas
+    # e espectrograma. y mono ou (canais, amostras): como em save_audio_analysis,
+    # a loudness usa os canais e as demais métricas a média deles
+    base_filename = os.path.splitext(os.path.basename(input_file))[0]
+    y_mono = librosa.to_mono(y) if np.ndim(y) > 1 else y
+    with span('metrics', file=input_file):
+        S = compute_spectrogram(y_mono)
+        metrics = calculate_metrics(y, sr, S=S)
+    with span('spectrogram', file=input_file):
+        generate_spectrogram(y_mono, sr, os.path.join(output_folder, f'{base_filename}_{stage}_spectrogram.png'), S=S)
+    if write_txt:
+        save_metrics(metrics, os.path.join(output_folder, f'{base_filename}_{stage}_metrics.txt'))
+    return metrics
+
+def analysis_cache_key(cache, input_file, streaming):
+    # Tudo o que muda as métricas ou a imagem do espectrograma entra na chave
+    return cache.make_key(cache.file_digest(input_file), metrics=METRICS_VERSION, n_fft=N_FFT, hop_length=HOP_LENGTH,
+                          streaming=streaming, block_length=streaming_block_length,
+                          renderer=spectrogram_renderer, width=spectrogram_width, height=spectrogram_height)
+
+def save_audio_analysis(input_file, output_folder, stage='original', streaming=None, cache=None, write_txt=True):
+    with span('save_audio_analysis', file=input_file, stage=stage) as current:
+        return _save_audio_analysis(input_file, output_folder, stage, streaming, cache, write_txt, current)
+
+def _save_audio_analysis(input_file, output_folder, stage, streaming, cache, write_txt, current):
+    # Arquivos longos são analisados em blocos para manter a memória constante
+    if streaming is None:
+        streaming = sf.info(input_file).duration >= streaming_min_duration
+    current.set(streaming=streaming)
+
     base_filename = os.path.splitext(os.path.basename(input_file))[0]
-    metrics = calculate_metrics(y, sr)
     metrics_file = os.path.join(output_folder, f'{base_filename}_{stage}_metrics.txt')
     spectrogram_file = os.path.join(output_folder, f'{base_filename}_{stage}_spectrogram.png')
-    save_metrics(metrics, metrics_file)
-    generate_spectrogram(y, sr, spectrogram_file)
-    print(f'Análise de áudio {stage} salva em {metrics_file} e {spectrogram_file}')
+
+    if cache is not None:
+        cache_key = analysis_cache_key(cache, input_file, streaming)
+        with span('cache_lookup', file=input_file):
+            cached = cache.get(cache_key)
+        current.set(cache_hit=cached is not None)
+        if cached is not None:
+            metrics, cached_spectrogram = cached
+            try:
+                shutil.copyfile(cached_spectrogram, spectrogram_file)
+                if write_txt:
+                    save_metrics(metrics, metrics_file)
+                print(f'Análise de áudio {stage} recuperada do cache em {spectrogram_file}')
+                return metrics
+            except FileNotFoundError:
+                pass  # Entrada removida por outro processo; a análise é refeita
+
+    if streaming:
+        with span('stream_features', file=input_file):
+            sr, metrics, S = stream_audio_features(input_file)
+        with span('spectrogram', file=input_file):
+            generate_spectrogram(None, sr, spectrogram_file, S=S, hop_length=HOP_LENGTH * streaming_block_length)
+    else:
+        with span('decode', file=input_file):
+            y_channels, sr = load_audio(input_file, mono=False)
+            y = librosa.to_mono(y_channels)
+        with span('metrics', file=input_file):
+            S = compute_spectrogram(y)
+            metrics = calculate_metrics(y_channels, sr, S=S)
+        with span('spectrogram', file=input_file):
+            generate_spectrogram(y, sr, spectrogram_file, S=S)
+
+    if write_txt:
+        save_metrics(metrics, metrics_file)
+    if cache is not None:
+        cache.put(cache_key, metrics, spectrogram_file)
+    print(f'Análise de áudio {stage} salva em {spectrogram_file}')
+    return metrics
@@ -1,18 +1,23 @@
+import hashlib
 import logging
 import os
 import shutil
 import streamlit as st
 from streamlit_option_menu import option_menu
-from extractor import extract_audio
-from analyzer import save_audio_analysis, analyze_audio_for_parameters
+from extractor import extract_audio, extract_audio_file
+from analyzer import save_audio_analysis, analyze_audio_for_parameters, calculate_metrics
 from enhancer import AudioProcessor
-from pydub import AudioSegment
-from config import create_directory_if_not_exists, staging_folder, treated_folder, converted_folder, input_folder
-import librosa
-import librosa.display
-import matplotlib.pyplot as plt
+from cache import get_cache, MemoryCache
+from waveform import load_peaks, sample_envelope
+from cutter import cut_audio
+from program import ProgramAssembler
+from metrics_store import get_store
+from suggester import get_suggester
+from wavmap import load_audio
+from instrumentation import span
+from config import create_directory_if_not_exists, staging_folder, treated_folder, converted_folder, input_folder, extraction_workers, extraction_sample_rate, extraction_channels, extraction_sample_format, legacy_metrics_txt, app_cache_ttl, app_cache_max_entries, app_cache_max_bytes, mp3_bitrate, mp3_vbr_quality, loudness_target, true_peak_ceiling
+import soundfile as sf
 from io import BytesIO
-import tempfile
 
 # Configuração do logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levellevel)s - %(message)s')
@@ -26,6 +31,11 @@ def process_file(processor, input_path, treated_path, noise_reduction_prop, low_
     except Exception as e:
         logging.error(f"Erro ao processar arquivo: {e}")
 
+def create_processor():
+    # Mesmas opções de codificação e loudness do main.py e da CLI (config.py)
+    return AudioProcessor(bitrate=mp3_bitrate, vbr_quality=mp3_vbr_quality,
+                          loudness_target=loudness_target, true_peak_ceiling=true_peak_ceiling)
+
 def treat_audio_file(processor, input_path, noise_reduction_prop, low_cutoff, high_cutoff):
     treated_path = input_path.replace('.wav', '_treated.mp3')
     process_file(processor, input_path, treated_path, noise_reduction_prop, low_cutoff, high_cutoff)
@@ -42,20 +52,20 @@ def convert_audio_to_mp3(input_folder, converted_folder):
 
             try:
                 logging.info(f"Convertendo o áudio: {input_path}")
+                from pydub import AudioSegment
                 audio = AudioSegment.from_wav(input_path)
                 audio.export(converted_path, format='mp3')
                 logging.info(f"Áudio convertido salvo em {converted_path}")
             except Exception as e:
                 logging.error(f"Erro ao converter {filename}: {e}")
 
-def analyze_audio(folder, stage):
-    analysis_folder = os.path.join(folder, 'analysis')
+def analyze_audio_file(file_path, stage):
+    analysis_folder = os.path.join(os.path.dirname(file_path), 'analysis')
     create_directory_if_not_exists(analysis_folder)
-    for filename in os.listdir(folder):
-        if filename.endswith('.wav') or filename.endswith('.mp3'):
-            input_path = os.path.join(folder, filename)
-            logging.info(f"Analisando o áudio {stage}: {input_path}")
-            save_audio_analysis(input_path, analysis_folder, stage=stage)
+    logging.info(f"Analisando o áudio {stage}: {file_path}")
+    metrics = save_audio_analysis(file_path, analysis_folder, stage=stage, cache=get_cache(), write_txt=legacy_metrics_txt)
+    get_store().append(file_path, stage, metrics)
+    return metrics
 
 def list_files_in_folder(folder):
     return [filename for filename in os.listdir(folder) if filename.endswith(('.wav', '.mp3', '.mp4'))]
@@ -83,8 +93,11 @@ def display_audio_analysis(file_path, stage):
     st.subheader(f"Análise de Áudio ({stage.capitalize()})")
     
     base_filename = os.path.splitext(os.path.basename(file_path))[0]
+    metrics = get_store().get(file_path, stage)
     metrics_file = os.path.join(analysis_folder, f'{base_filename}_{stage}_metrics.txt')
-    if os.path.exists(metrics_file):
+    if metrics is not None:
+        st.text("\n".join(f"{key}: {value}" for key, value in metrics.items()))
+    elif os.path.exists(metrics_file):
         with open(metrics_file, 'r') as f:
             st.text(f.read())
 
@@ -93,52 +106,117 @@ def display_audio_analysis(file_path, stage):
         st.image(spectrogram_file)
 
 def suggest_parameters(metrics):
-    noise_reduction_prop = 0.5 + (metrics.get('Zero Crossing Rate', 0) * 0.5)
-    low_cutoff = max(20, int(metrics.get('Spectral Centroid', 100)))
-    high_cutoff = min(16000, int(metrics.get('Spectral Bandwidth', 8000)))
-    
-    return noise_reduction_prop, low_cutoff, high_cutoff
+    # Modelo treinado mantido em memória pelo suggester; sem modelo, a heurística
+    return get_suggester().suggest(metrics)
+
+# Cache entre reexecuções do Streamlit. As chaves são o hash do conteúdo (os
+# argumentos com "_" não entram no hash): um arquivo alterado gera nova entrada.
+# Dados pequenos (métricas, sugestões) usam cache_data; as pirâmides de picos e
+# as imagens da forma de onda ficam num MemoryCache, limitado também em bytes.
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def file_content_digest(file_path):
+    # Hash memorizado por tamanho e mtime no cache de análises
+    return get_cache().file_digest(file_path)
+
+@st.cache_data(ttl=app_cache_ttl, max_entries=app_cache_max_entries, show_spinner=False)
+def cached_parameter_metrics(digest, _file_path):
+    # Mesmas métricas do dataset de treino (calculate_metrics sobre os canais originais)
+    with span('decode', file=_file_path):
+        y, sr = load_audio(_file_path, mono=False)
+    with span('metrics', file=_file_path):
+        metrics = calculate_metrics(y, sr)
+    return {key: float(value) for key, value in metrics.items()}
+
+def cached_suggestion(digest, file_path):
+    # Só as métricas ficam em cache: a sugestão sai do modelo em memória, que o
+    # suggester relê depois de um novo treino
+    return suggest_parameters(cached_parameter_metrics(digest, file_path))
+
+# Colunas da forma de onda: uma por pixel da figura de 10 polegadas a 100 dpi
+WAVEFORM_COLUMNS = 1000
+
+def store_upload(digest, data, suffix):
+    # O upload é gravado uma vez, com o hash no nome, para ser lido em blocos e por
+    # trechos. Fica no LRU do cache de análises, que o remove (com a pirâmide de
+    # picos) quando passa de cache_max_bytes; cada reexecução renova o acesso
+    return get_cache().put_upload(digest, data, suffix)
+
+@st.cache_resource(show_spinner=False)
+def get_waveform_cache():
+    # Um cache por servidor, compartilhado entre as sessões
+    return MemoryCache(app_cache_max_bytes, app_cache_max_entries * 8, app_cache_ttl)
+
+def load_waveform_peaks(digest, audio_path):
+    # Pirâmide de picos construída em blocos e gravada ao lado do áudio
+    return get_waveform_cache().get_or_compute(('peaks', digest), lambda: load_peaks(audio_path))
+
+def render_waveform(digest, peaks, audio_path, zoom_start, zoom_end):
+    return get_waveform_cache().get_or_compute(('waveform', digest, zoom_start, zoom_end),
+                                               lambda: _render_waveform(peaks, audio_path, zoom_start, zoom_end))
+
+def _render_waveform(peaks, audio_path, zoom_start, zoom_end):
+    # PNG da forma de onda de um trecho, desenhada a partir de no máximo
+    # WAVEFORM_COLUMNS colunas de mínimo e máximo; o matplotlib só é importado aqui
+    from matplotlib.figure import Figure
+    envelope = peaks.window(zoom_start, zoom_end, WAVEFORM_COLUMNS)
+    if envelope is None and zoom_end > zoom_start:
+        # Zoom mais fino que a pirâmide: lê só as amostras do trecho
+        y, sr = sf.read(cut_audio(audio_path, zoom_start, zoom_end, output_format='wav'), dtype='float32', always_2d=True)
+        envelope = sample_envelope(y.mean(axis=1), sr, zoom_start, WAVEFORM_COLUMNS)
+    times, mins, maxs = envelope if envelope is not None else ([], [], [])
+
+    fig = Figure(figsize=(10, 3))  # Ajuste o tamanho para ser mais retangular
+    ax = fig.add_subplot()
+    ax.fill_between(times, mins, maxs, step='post', linewidth=0.5)
+    ax.set_xlim(zoom_start, zoom_end)
+    ax.set(title="Forma de Onda do Áudio", xlabel="Tempo (s)", ylabel="Amplitude")
+    image = BytesIO()
+    fig.savefig(image, format='png')
+    return image.getvalue()
+
+@st.cache_resource(show_spinner=False)
+def get_program_assembler():
+    # Um montador por servidor: os áudios decodificados são compartilhados entre sessões
+    return ProgramAssembler()
+
+def program_paths(sequence):
+    paths = []
+    for audio in sequence:
+        audio_path = os.path.join('audio/programa', audio)
+        if os.path.exists(audio_path):
+            paths.append(audio_path)
+        else:
+            st.error(f"Arquivo não encontrado: {audio_path}")
+    return paths
 
 def extract_audio_from_file(input_file, output_folder):
-    try:
-        temp_dir = os.path.join(output_folder, "temp_video")
-        create_directory_if_not_exists(temp_dir)
-
-        temp_file_path = os.path.join(temp_dir, os.path.basename(input_file))
-        shutil.copy(input_file, temp_file_path)
-
-        logging.info(f"Extraindo áudio do vídeo {input_file}")
-        extract_audio(temp_file_path, output_folder)
+    create_directory_if_not_exists(output_folder)
+    output_path = os.path.join(output_folder, os.path.splitext(os.path.basename(input_file))[0] + '.wav')
 
-        shutil.rmtree(temp_dir)
-    except Exception as e:
-        logging.error(f"Erro ao extrair áudio do vídeo {input_file}: {e}")
+    logging.info(f"Extraindo áudio do vídeo {input_file}")
+    result = extract_audio_file(input_file, output_path, extraction_sample_rate, extraction_channels, extraction_sample_format)
+    if result['status'] == 'error':
+        logging.error(f"Erro ao extrair áudio do vídeo {input_file}: {result['error']}")
+    return result
 
 def get_file_as_bytes(file_path):
     with open(file_path, 'rb') as file:
         return file.read()
 
-# Função para cortar áudio
-def cut_audio(audio, start_time, end_time):
-    return audio[start_time:end_time]
-
 def cortar_audio():
     st.title("Cortar Áudio")
 
     uploaded_file = st.file_uploader("Faça upload do seu arquivo de áudio", type=["mp3", "wav"])
 
     if uploaded_file is not None:
-        # Salvar o arquivo temporariamente
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-            temp_file.write(uploaded_file.getbuffer())
-            temp_file_path = temp_file.name
-
-        # Carregar o áudio usando pydub para edição
-        audio = AudioSegment.from_file(temp_file_path)
-
-        # Carregar o áudio usando librosa para visualização
-        y, sr = librosa.load(temp_file_path, sr=None)
-        duration = librosa.get_duration(y=y, sr=sr)
+        # Gravado e indexado só na primeira vez; o áudio nunca é decodificado inteiro
+        data = uploaded_file.getvalue()
+        digest = content_digest(data)
+        audio_path = store_upload(digest, data, os.path.splitext(uploaded_file.name)[1] or ".wav")
+        peaks = load_waveform_peaks(digest, audio_path)
+        duration = peaks.duration
 
         st.write(f"Duração do áudio: {duration:.2f} segundos")
 
@@ -147,11 +225,8 @@ def cortar_audio():
         zoom_start = st.slider("Zoom - Início (segundos)", 0.0, duration, 0.0)
         zoom_end = st.slider("Zoom - Fim (segundos)", zoom_start, duration, duration)
 
-        # Exibir a forma de onda do áudio com zoom, ajustando o tamanho do gráfico
-        fig, ax = plt.subplots(figsize=(10, 3))  # Ajuste o tamanho para ser mais retangular
-        librosa.display.waveshow(y[int(zoom_start*sr):int(zoom_end*sr)], sr=sr, ax=ax)
-        ax.set(title="Forma de Onda do Áudio", xlabel="Tempo (s)", ylabel="Amplitude")
-        st.pyplot(fig)
+        # Exibir a forma de onda do áudio com zoom
+        st.image(render_waveform(digest, peaks, audio_path, zoom_start, zoom_end))
 
         # Ouvir o áudio
         st.audio(uploaded_file, format='audio/wav')
@@ -161,17 +236,13 @@ def cortar_audio():
         start_time = st.number_input("Início do corte (segundos)", min_value=0.0, max_value=duration, value=0.0, step=0.1)
         end_time = st.number_input("Fim do corte (segundos)", min_value=0.0, max_value=duration, value=duration, step=0.1)
 
-        start_sample = int(start_time * 1000)
-        end_sample = int(end_time * 1000)
-
         if st.button("Cortar Áudio"):
-            # Cortar o áudio
-            cut_audio_segment = cut_audio(audio, start_sample, end_sample)
+            if end_time <= start_time:
+                st.error("O fim do corte deve ser maior que o início.")
+                return
 
-            # Salvar o áudio cortado em memória
-            cut_audio_file = BytesIO()
-            cut_audio_segment.export(cut_audio_file, format="wav")
-            cut_audio_file.seek(0)
+            # Lê só o trecho pedido e gera o WAV em memória
+            cut_audio_file = cut_audio(audio_path, start_time, end_time, output_format="wav")
 
             # Exibir o áudio cortado e oferecer para download
             st.audio(cut_audio_file, format='audio/wav')
@@ -227,23 +298,12 @@ def criar_programa_de_radio():
                     updated_sequence.pop(idx)
                     st.session_state.sequence = updated_sequence
 
+        crossfade = st.slider("Crossfade entre áudios (segundos)", 0.0, 5.0, 0.0, step=0.5)
+
         # Pré-visualização da sequência
         if st.button("Ouvir Sequência Completa"):
-            final_audio = AudioSegment.empty()
-            for audio in st.session_state.sequence:
-                audio_path = os.path.join('audio/programa', audio)
-                try:
-                    audio_segment = AudioSegment.from_file(audio_path)
-                    final_audio += audio_segment
-                except FileNotFoundError:
-                    st.error(f"Arquivo não encontrado: {audio_path}")
-                    continue
-
-            # Converter o áudio final para um formato que pode ser reproduzido no Streamlit
-            preview_audio = BytesIO()
-            final_audio.export(preview_audio, format="wav")
-            preview_audio.seek(0)
-
+            # Só os áudios novos são decodificados; o começo inalterado da sequência é reaproveitado
+            preview_audio = get_program_assembler().render(program_paths(st.session_state.sequence), output_format="wav", crossfade=crossfade)
             st.audio(preview_audio, format='audio/wav')
 
     # Exportar Programa de Rádio e Sequência em TXT
@@ -265,21 +325,9 @@ def criar_programa_de_radio():
                 mime="text/plain"
             )
 
-            # Exportar o programa de rádio completo
-            final_audio = AudioSegment.empty()
-            for audio in st.session_state.sequence:
-                audio_path = os.path.join('audio/programa', audio)
-                try:
-                    audio_segment = AudioSegment.from_file(audio_path)
-                    final_audio += audio_segment
-                except FileNotFoundError:
-                    st.error(f"Arquivo não encontrado: {audio_path}")
-                    continue
-
-            # Salvar o programa de rádio final em memória
-            export_audio_program = BytesIO()
-            final_audio.export(export_audio_program, format="mp3")
-            export_audio_program.seek(0)
+            # Exportar o programa de rádio completo, codificado em memória
+            export_audio_program = get_program_assembler().render(program_paths(st.session_state.sequence), output_format="mp3",
+                                                                  crossfade=crossfade, bitrate=mp3_bitrate, vbr_quality=mp3_vbr_quality)
 
             # Baixar o arquivo final
             st.download_button(
@@ -291,6 +339,8 @@ def criar_programa_de_radio():
 
 def main():
     st.title("Processamento de Áudio")
+    # Carrega o modelo de sugestão uma vez por processo, antes do primeiro clique
+    get_suggester().warm()
 
     # Adiciona custom CSS para alinhar os itens da navbar
     st.markdown("""
@@ -364,7 +414,7 @@ def main():
 
         st.subheader("Extrair Áudio")
         if st.button('Extrair Áudio de Todos os Vídeos na Pasta'):
-            extract_audio(input_folder, staging_folder)
+            extract_audio(input_folder, staging_folder, extraction_workers, extraction_sample_rate, extraction_channels, extraction_sample_format)
             st.success('Áudio de todos os vídeos extraído com sucesso!')
 
         video_file = st.selectbox("Selecione um vídeo para extrair o áudio", video_files)
@@ -384,7 +434,7 @@ def main():
         if audio_file:
             file_path = os.path.join(staging_folder, audio_file)
             if st.button('Tratar Áudio Selecionado'):
-                treated_file_path = treat_audio_file(AudioProcessor(), file_path, noise_reduction_prop, low_cutoff, high_cutoff)
+                treated_file_path = treat_audio_file(create_processor(), file_path, noise_reduction_prop, low_cutoff, high_cutoff)
                 st.success('Áudio tratado com sucesso!')
                 display_audio_analysis(treated_file_path, "treated")
 
@@ -398,28 +448,37 @@ def main():
         folder_option = st.selectbox("Selecione a pasta", ["staging", "treated", "converted"])
         folder_mapping = {"staging": staging_folder, "treated": treated_folder, "converted": converted_folder}
         selected_folder = folder_mapping[folder_option]
+        # Mesmo nome de estágio da CLI e do main.py: o staging é o áudio 'original'
+        stage = {"staging": "original"}.get(folder_option, folder_option)
 
         audio_file = st.selectbox("Selecione o arquivo", list_files_in_folder(selected_folder))
         if audio_file:
             file_path = os.path.join(selected_folder, audio_file)
             if st.button(f'Analisar Áudio {folder_option.capitalize()}'):
-                analyze_audio(selected_folder, folder_option)
+                analyze_audio_file(file_path, stage)
                 st.success(f'Análise do áudio {folder_option} concluída!')
-                display_audio_analysis(file_path, folder_option)
+                display_audio_analysis(file_path, stage)
 
             if st.button("Gerar Sugestão de Parâmetros"):
-                y, sr, metrics = analyze_audio_for_parameters(file_path)
-                noise_reduction_prop, low_cutoff, high_cutoff = suggest_parameters(metrics)
+                noise_reduction_prop, low_cutoff, high_cutoff = cached_suggestion(file_content_digest(file_path), file_path)
                 st.write("Sugestão de Parâmetros:")
                 st.write(f"Proporção de Redução de Ruído: {noise_reduction_prop}")
                 st.write(f"Frequência de Corte Baixa: {low_cutoff} Hz")
                 st.write(f"Frequência de Corte Alta: {high_cutoff} Hz")
 
                 if st.button("Aplicar Sugestões no Tratamento"):
-                    treated_file_path = treat_audio_file(AudioProcessor(), file_path, noise_reduction_prop, low_cutoff, high_cutoff)
+                    treated_file_path = treat_audio_file(create_processor(), file_path, noise_reduction_prop, low_cutoff, high_cutoff)
                     st.success("Sugestões aplicadas e áudio tratado com sucesso!")
                     display_audio_analysis(treated_file_path, "treated")
 
+        if st.button("Sugerir Parâmetros para Todos os Arquivos Analisados"):
+            # Métricas já gravadas no banco: uma única chamada ao modelo para a pasta inteira
+            rows = get_store().query(stage=stage)
+            suggestions = get_suggester().suggest_many(rows)
+            st.dataframe([{"Arquivo": os.path.basename(row['file']), "Redução de Ruído": round(noise, 3),
+                           "Corte Baixo (Hz)": low, "Corte Alto (Hz)": high}
+                          for row, (noise, low, high) in zip(rows, suggestions)])
+
     elif selected_section == "Cortar Áudio":
         cortar_audio()
 
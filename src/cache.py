@@ -0,0 +1,214 @@
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+HASH_BLOCK_SIZE = 1024 * 1024
+# Arquivos derivados gravados ao lado de um objeto (a pirâmide de picos de um
+# upload); são removidos junto com ele
+SIDECAR_SUFFIXES = ('.peaks.npz',)
+
+class AnalysisCache:
+    """
+    Cache persistente de análises, endereçado pelo hash do conteúdo do arquivo
+    e pelos parâmetros da análise. O índice fica em SQLite, então vários
+    processos (CLI e Streamlit) podem usar a mesma pasta ao mesmo tempo.
+
+    Os uploads da interface ficam no mesmo LRU, então o limite de bytes vale
+    para os dois.
+
+    :param cache_folder: Pasta onde ficam o índice, os espectrogramas e os uploads.
+    :param max_bytes: Tamanho máximo dos arquivos armazenados; as entradas
+        usadas há mais tempo são removidas primeiro (LRU).
+    """
+
+    def __init__(self, cache_folder, max_bytes):
+        # Caminhos absolutos: o singleton continua válido se o diretório atual mudar
+        cache_folder = os.path.abspath(cache_folder)
+        self.cache_folder = cache_folder
+        self.objects_folder = os.path.join(cache_folder, 'objects')
+        self.max_bytes = max_bytes
+        os.makedirs(self.objects_folder, exist_ok=True)
+        self.db_path = os.path.join(cache_folder, 'index.db')
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, metrics TEXT, spectrogram TEXT, size INTEGER, last_access REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def file_digest(self, path):
+        # O hash só é recalculado quando o tamanho ou a data de modificação mudam
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._connect() as conn:
+            row = conn.execute('SELECT size, mtime_ns, digest FROM files WHERE path = ?', (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def make_key(self, digest, **params):
+        payload = json.dumps({'digest': digest, 'params': params}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute('SELECT metrics, spectrogram FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        spectrogram_path = os.path.join(self.objects_folder, row[1])
+        if not os.path.exists(spectrogram_path):
+            return None
+        return json.loads(row[0]), spectrogram_path
+
+    def put(self, key, metrics, spectrogram_file):
+        filename = f'{key}.png'
+        target = os.path.join(self.objects_folder, filename)
+        # Cópia atômica: outro processo nunca lê um PNG pela metade
+        temp_target = f'{target}.{uuid.uuid4().hex}.tmp'
+        shutil.copyfile(spectrogram_file, temp_target)
+        os.replace(temp_target, target)
+
+        metrics_json = json.dumps({name: float(value) for name, value in metrics.items()})
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                         (key, metrics_json, filename, os.path.getsize(target), time.time()))
+        self.evict()
+
+    def put_upload(self, digest, data, suffix):
+        """
+        Grava um upload uma única vez, com o hash no nome, e renova seu acesso
+        nas chamadas seguintes. A pirâmide de picos gravada ao lado não entra
+        no tamanho (tem poucos bytes por segundo de áudio), mas sai junto.
+
+        :return: Caminho do arquivo.
+        """
+        key = self.make_key(digest, upload=suffix)
+        filename = f'{key}{suffix}'
+        target = os.path.join(self.objects_folder, filename)
+        with self._connect() as conn:
+            found = conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key)).rowcount
+        if found and os.path.exists(target):
+            return target
+
+        temp_target = f'{target}.{uuid.uuid4().hex}.tmp'
+        with open(temp_target, 'wb') as f:
+            f.write(data)
+        os.replace(temp_target, target)
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)', (key, '{}', filename, len(data), time.time()))
+        # O upload recém-gravado fica, mesmo maior que o limite: a interface vai lê-lo
+        self.evict(keep=key)
+        return target
+
+    def evict(self, keep=None):
+        with self._connect() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            removed = []
+            for key, filename, size in conn.execute('SELECT key, spectrogram, size FROM entries ORDER BY last_access').fetchall():
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                removed.append((key, filename))
+                total -= size
+            conn.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key, _ in removed])
+        for _, filename in removed:
+            for suffix in ('',) + SIDECAR_SUFFIXES:
+                try:
+                    os.remove(os.path.join(self.objects_folder, filename + suffix))
+                except FileNotFoundError:
+                    pass
+
+def object_nbytes(value):
+    # Arrays e objetos com nbytes (ex.: WaveformPeaks), bytes pelo tamanho; o resto pelo getsizeof
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return sys.getsizeof(value)
+
+class MemoryCache:
+    """
+    Cache em memória (LRU) dos objetos grandes da interface, compartilhado
+    entre as sessões e threads do Streamlit. Além do número de entradas e da
+    idade, limita o total de bytes (object_nbytes) mantidos.
+
+    :param max_bytes: Total máximo; as entradas usadas há mais tempo saem primeiro.
+    :param max_entries: Número máximo de entradas; None não limita.
+    :param ttl: Segundos até uma entrada expirar; None não expira.
+    """
+
+    def __init__(self, max_bytes, max_entries=None, ttl=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()  # chave -> (valor, bytes, criação)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[2] < self.ttl):
+                self._entries.move_to_end(key)
+                return entry[0]
+        # Calculado fora do lock: outras sessões continuam lendo o cache
+        value = compute()
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, object_nbytes(value), time.monotonic())
+            self._bytes += self._entries[key][1]
+            # A entrada recém-calculada fica mesmo sozinha acima do limite
+            while len(self._entries) > 1 and (self._bytes > self.max_bytes
+                                              or self.max_entries is not None and len(self._entries) > self.max_entries):
+                self._remove(next(iter(self._entries)))
+        return value
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+_default_cache = None
+
+def get_cache():
+    # Cache compartilhado entre main.py e app.py, configurado em config.py
+    global _default_cache
+    if _default_cache is None:
+        from config import cache_folder, cache_max_bytes
+        _default_cache = AnalysisCache(cache_folder, cache_max_bytes)
+    return _default_cache
@@ -0,0 +1,267 @@
+"""
+Linha de comando não interativa para o pipeline de áudio.
+
+Exemplos:
+    python src/cli.py all --jobs 8
+    python src/cli.py extract --include '*.mp4' --exclude 'teste_*'
+    python src/cli.py analyze --stage treated
+    python src/cli.py watch --jobs 4
+    python src/cli.py queue-status
+
+Códigos de saída: 0 sucesso, 1 algum arquivo falhou, 2 argumentos inválidos.
+"""
+import argparse
+import concurrent.futures
+import fnmatch
+import os
+import sys
+import time
+from extractor import VIDEO_EXTENSIONS, extract_audio_file, is_up_to_date
+from enhancer import AudioProcessor
+from instrumentation import enable_tracing, export_chrome_trace
+from jobqueue import JobQueue
+from main import process_file, convert_file, analyze_file, init_worker, process_video_fused
+from metrics_store import get_store
+from config import (create_directory_if_not_exists, input_folder, staging_folder, treated_folder, converted_folder,
+                    mp3_bitrate, mp3_vbr_quality, loudness_target, true_peak_ceiling,
+                    extraction_sample_rate, extraction_channels, extraction_sample_format,
+                    queue_db, ingest_poll_interval, job_lease_seconds, job_max_attempts)
+
+STAGE_EXTENSIONS = {'original': ('staging', '.wav'), 'treated': ('treated', '.mp3'), 'converted': ('converted', '.mp3')}
+
+def select_files(folder, extensions, include, exclude):
+    if not os.path.isdir(folder):
+        return []
+    selected = []
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(extensions):
+            continue
+        if include and not any(fnmatch.fnmatch(filename, pattern) for pattern in include):
+            continue
+        if any(fnmatch.fnmatch(filename, pattern) for pattern in exclude):
+            continue
+        selected.append(os.path.join(folder, filename))
+    return selected
+
+def output_path(input_path, folder, extension):
+    return os.path.join(folder, os.path.splitext(os.path.basename(input_path))[0] + extension)
+
+class Pipeline:
+    """
+    Executa as etapas de forma sobreposta: assim que um arquivo termina uma
+    etapa, as etapas seguintes dele entram na fila, sem esperar os demais.
+    A extração roda em threads (o trabalho é do ffmpeg); tratamento, conversão
+    e análise rodam em processos.
+
+    Com queued=True (serviço de ingestão), uma extração pulada encadeia todas
+    as etapas seguintes: a fila descarta as que já foram concluídas, e as que
+    uma queda interrompeu são retomadas.
+    """
+
+    def __init__(self, jobs, stages, folders, keep_staging=False, queued=False):
+        self.stages = stages
+        self.folders = folders
+        self.keep_staging = keep_staging
+        self.queued = queued
+        self.processor = AudioProcessor(bitrate=mp3_bitrate, vbr_quality=mp3_vbr_quality,
+                                        loudness_target=loudness_target, true_peak_ceiling=true_peak_ceiling)
+        self.threads = concurrent.futures.ThreadPoolExecutor(max_workers=jobs)
+        self.processes = concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_worker)
+        self.pending = {}
+        self.results = []
+
+    def submit(self, step, input_path):
+        if step == 'extract':
+            future = self.threads.submit(extract_audio_file, input_path, output_path(input_path, self.folders['staging'], '.wav'),
+                                         extraction_sample_rate, extraction_channels, extraction_sample_format)
+        elif step == 'fused':
+            future = self.processes.submit(process_video_fused, self.processor, input_path,
+                                           output_path(input_path, self.folders['staging'], '.wav'),
+                                           output_path(input_path, self.folders['treated'], '.mp3'), self.keep_staging)
+        elif step == 'treat':
+            future = self.processes.submit(process_file, self.processor, input_path, output_path(input_path, self.folders['treated'], '.mp3'))
+        elif step == 'convert':
+            future = self.processes.submit(convert_file, input_path, output_path(input_path, self.folders['converted'], '.mp3'))
+        else:
+            future = self.processes.submit(analyze_file, input_path, step.split(':')[1])
+        self.pending[future] = (step, input_path)
+        return future
+
+    def next_steps(self, step, result):
+        if result['status'] == 'error':
+            return []
+        output = result['output']
+        if step == 'extract':
+            steps = [('treat', output), ('convert', output), ('analyze:original', output)]
+            if result['status'] == 'skipped' and not self.queued:
+                # WAV já existia: só refaz o tratamento/conversão se a saída estiver desatualizada
+                steps = [(next_step, path) for next_step, path in steps
+                         if next_step == 'treat' and not is_up_to_date(path, output_path(path, self.folders['treated'], '.mp3'))
+                         or next_step == 'convert' and not is_up_to_date(path, output_path(path, self.folders['converted'], '.mp3'))]
+        elif step == 'fused':
+            # O WAV de staging só existe para conversão se foi pedido explicitamente
+            steps = [('analyze:treated', output)]
+            if self.keep_staging:
+                steps.append(('convert', result['input']))
+        elif step == 'treat':
+            steps = [('analyze:treated', output)]
+        elif step == 'convert':
+            steps = [('analyze:converted', output)]
+        else:
+            steps = []
+        return [(next_step, path) for next_step, path in steps if next_step.split(':')[0] in self.stages]
+
+    def run(self, initial):
+        for step, input_path in initial:
+            self.submit(step, input_path)
+        rows = []
+        try:
+            while self.pending:
+                done, _ = concurrent.futures.wait(self.pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    step, input_path = self.pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'input': input_path, 'output': None, 'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+                    result['step'] = step
+                    self.results.append(result)
+                    if (step.startswith('analyze') or step == 'fused') and result['status'] == 'ok':
+                        rows.append((result['input'], result['stage'], result['metrics']))
+                    for next_step, path in self.next_steps(step, result):
+                        self.submit(next_step, path)
+        finally:
+            self.threads.shutdown()
+            self.processes.shutdown()
+            get_store().append_many(rows)
+        return self.results
+
+def print_summary(results, elapsed):
+    print(f"\nResumo ({elapsed:.1f} s):")
+    for step in sorted({result['step'] for result in results}):
+        step_results = [result for result in results if result['step'] == step]
+        counts = {status: sum(1 for result in step_results if result['status'] == status) for status in ('ok', 'skipped', 'error')}
+        throughput = len(step_results) / elapsed if elapsed > 0 else 0.0
+        print(f"  {step:<18} {counts['ok']:>5} ok  {counts['skipped']:>5} pulados  {counts['error']:>5} erros  ({throughput:.2f} arquivos/s)")
+    failures = [result for result in results if result['status'] == 'error']
+    if failures:
+        print("Falhas:")
+        for result in failures:
+            print(f"  [{result['step']}] {result['input']}: {result['error']}")
+
+def print_queue_status(queue):
+    stats = queue.stats()
+    if not stats:
+        print("Fila vazia.")
+        return
+    print(f"{'etapa':<18} {'pendentes':>9} {'executando':>10} {'concluídos':>10} {'erros':>6} {'jobs/min':>9} {'média (s)':>9}")
+    for step, values in sorted(stats.items()):
+        mean_elapsed = f"{values['mean_elapsed']:.1f}" if values['mean_elapsed'] is not None else '-'
+        print(f"{step:<18} {values['pending']:>9} {values['running']:>10} {values['done']:>10} {values['error']:>6} "
+              f"{values['throughput']:>9.2f} {mean_elapsed:>9}")
+    oldest = max((values['oldest_pending'] for values in stats.values() if values['oldest_pending'] is not None), default=None)
+    if oldest is not None:
+        print(f"Job pendente mais antigo: {oldest:.0f} s")
+    failures = queue.failures()
+    if failures:
+        print("Falhas:")
+        for step, path, error in failures:
+            print(f"  [{step}] {path}: {error}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Pipeline de extração, tratamento e análise de áudio')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--include', action='append', default=[], help='glob de nomes de arquivo a incluir (pode repetir)')
+    common.add_argument('--exclude', action='append', default=[], help='glob de nomes de arquivo a excluir (pode repetir)')
+    common.add_argument('--jobs', type=int, default=os.cpu_count(), help='número de processos/threads de trabalho')
+    common.add_argument('--trace', help='grava spans por etapa neste arquivo JSON-lines')
+    common.add_argument('--videos', default=input_folder, help='pasta dos vídeos de entrada')
+    common.add_argument('--staging', default=staging_folder, help='pasta dos WAVs extraídos')
+    common.add_argument('--treated', default=treated_folder, help='pasta dos MP3 tratados')
+    common.add_argument('--converted', default=converted_folder, help='pasta dos MP3 convertidos')
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('extract', parents=[common], help='extrai o áudio dos vídeos')
+    subparsers.add_parser('treat', parents=[common], help='trata os WAVs extraídos')
+    subparsers.add_parser('convert', parents=[common], help='converte os WAVs extraídos para MP3 sem tratamento')
+    analyze = subparsers.add_parser('analyze', parents=[common], help='analisa os áudios de um estágio')
+    analyze.add_argument('--stage', choices=sorted(STAGE_EXTENSIONS) + ['all'], default='all')
+    pipeline = subparsers.add_parser('all', parents=[common], help='extrai, trata, converte e analisa em pipeline')
+    pipeline.add_argument('--fused', action='store_true',
+                          help='decodifica cada vídeo uma vez em memória para análise e tratamento, sem WAV de staging')
+    pipeline.add_argument('--keep-staging', action='store_true', help='no modo --fused, grava também o WAV de staging')
+    watch = subparsers.add_parser('watch', parents=[common], help='observa a pasta de vídeos e processa os arquivos novos continuamente')
+    watch.add_argument('--fused', action='store_true', help='processa cada vídeo no modo fundido (ver all --fused)')
+    watch.add_argument('--keep-staging', action='store_true', help='no modo --fused, grava também o WAV de staging')
+    watch.add_argument('--queue', default=queue_db, help='banco SQLite da fila de jobs')
+    watch.add_argument('--poll', type=float, default=ingest_poll_interval, help='intervalo entre varreduras da pasta, em segundos')
+    watch.add_argument('--once', action='store_true', help='processa o que já está na pasta e sai quando a fila esvaziar')
+    status = subparsers.add_parser('queue-status', help='mostra a profundidade e a vazão da fila de jobs')
+    status.add_argument('--queue', default=queue_db, help='banco SQLite da fila de jobs')
+    return parser
+
+def initial_tasks(args, folders):
+    def select(folder, extensions):
+        return select_files(folder, extensions, args.include, args.exclude)
+
+    if args.command == 'all' and args.fused:
+        return [('fused', path) for path in select(folders['videos'], VIDEO_EXTENSIONS)]
+    if args.command in ('extract', 'all'):
+        return [('extract', path) for path in select(folders['videos'], VIDEO_EXTENSIONS)]
+    if args.command == 'treat':
+        return [('treat', path) for path in select(folders['staging'], '.wav')]
+    if args.command == 'convert':
+        return [('convert', path) for path in select(folders['staging'], '.wav')]
+    stages = sorted(STAGE_EXTENSIONS) if args.stage == 'all' else [args.stage]
+    return [(f'analyze:{stage}', path) for stage in stages
+            for path in select(folders[STAGE_EXTENSIONS[stage][0]], STAGE_EXTENSIONS[stage][1])]
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'queue-status':
+        print_queue_status(JobQueue(args.queue))
+        return 0
+    if args.jobs < 1:
+        build_parser().error('--jobs deve ser pelo menos 1')
+    if args.trace:
+        enable_tracing(args.trace)
+
+    folders = {'videos': args.videos, 'staging': args.staging, 'treated': args.treated, 'converted': args.converted}
+    for folder in folders.values():
+        create_directory_if_not_exists(folder)
+
+    if args.command == 'watch':
+        return watch(args, folders)
+
+    tasks = initial_tasks(args, folders)
+    if not tasks:
+        print("Nenhum arquivo encontrado para processar.")
+        return 0
+
+    stages = {'extract', 'treat', 'convert', 'analyze'} if args.command == 'all' else {args.command}
+    start = time.perf_counter()
+    results = Pipeline(args.jobs, stages, folders, keep_staging=getattr(args, 'keep_staging', False)).run(tasks)
+    print_summary(results, time.perf_counter() - start)
+
+    if args.trace and os.path.exists(args.trace):
+        export_chrome_trace(args.trace, os.path.splitext(args.trace)[0] + '.trace.json')
+    return 1 if any(result['status'] == 'error' for result in results) else 0
+
+def watch(args, folders):
+    from ingest import IngestService
+    stages = {'extract', 'treat', 'convert', 'analyze'}
+    service = IngestService(JobQueue(args.queue), Pipeline(args.jobs, stages, folders, keep_staging=args.keep_staging, queued=True),
+                            lambda: select_files(folders['videos'], VIDEO_EXTENSIONS, args.include, args.exclude),
+                            'fused' if args.fused else 'extract', args.jobs, args.poll, job_lease_seconds, job_max_attempts)
+    try:
+        counts = service.run(once=args.once)
+    except KeyboardInterrupt:
+        print("\nIngestão interrompida; os jobs em andamento voltaram para a fila.")
+        return 0
+    finally:
+        if args.trace and os.path.exists(args.trace):
+            export_chrome_trace(args.trace, os.path.splitext(args.trace)[0] + '.trace.json')
+    return 1 if counts['error'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
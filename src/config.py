@@ -1,5 +1,8 @@
 import os
 
+# Caminhos relativos à raiz do repositório: main.py, cli.py, app.py e os
+# scripts de src/model são executados de lá (ex.: python src/cli.py all)
+
 # Diretórios
 input_folder = './videos'
 staging_folder = './audio/staging'
@@ -11,6 +14,59 @@ noise_reduction_prop = 0.8
 low_cutoff_frequency = 100
 high_cutoff_frequency = 8000
 
+# Análise em blocos (streaming) para gravações longas
+streaming_min_duration = 600  # segundos; arquivos mais longos são analisados em blocos
+streaming_block_length = 256  # quadros da STFT por bloco
+
+# Extração de áudio dos vídeos
+extraction_workers = os.cpu_count()  # processos ffmpeg simultâneos
+extraction_sample_rate = None  # ex.: 22050; None mantém a taxa original
+extraction_channels = None  # ex.: 1 para mono; None mantém os canais originais
+extraction_sample_format = None  # 's16', 's24', 's32' ou 'f32'; None usa o padrão do ffmpeg
+
+# Cache de análises compartilhado entre main.py e app.py
+cache_folder = './audio/.cache'
+cache_max_bytes = 512 * 1024 * 1024  # limite dos espectrogramas e uploads da interface em cache
+
+# Banco de métricas (uma linha por arquivo, estágio e conjunto de métricas)
+metrics_db = './audio/metrics.db'
+legacy_metrics_txt = False  # também grava os arquivos *_metrics.txt legados
+
+# Execução do tratamento em lote
+treatment_mode = 'process'  # 'process' (um processo por núcleo) ou 'thread'
+treatment_workers = None  # None usa todos os núcleos disponíveis
+
+# Serviço de ingestão contínua (python src/cli.py watch)
+queue_db = './audio/queue.db'  # fila persistente de jobs
+ingest_poll_interval = 5  # segundos entre varreduras da pasta de vídeos
+job_lease_seconds = 120  # um job sem renovação por esse tempo volta para a fila
+job_max_attempts = 3  # tentativas antes de um job ficar como erro
+
+# Codificação MP3 do áudio tratado
+mp3_bitrate = None  # ex.: '192k'; None usa o padrão do ffmpeg
+mp3_vbr_quality = None  # 0 (melhor) a 9; tem prioridade sobre mp3_bitrate
+
+# Normalização por loudness (ITU-R BS.1770 / EBU R128) do áudio tratado
+loudness_target = -23.0  # LUFS; None volta à normalização pelo pico das amostras
+true_peak_ceiling = -1.0  # dBTP máximo no MP3 gravado (o tratamento deixa enhancer.ENCODER_HEADROOM_DB de margem para o codificador)
+
+# Modelo de sugestão de parâmetros (salvo por src/model/train_model.py); sem ele, vale a heurística
+parameter_model = './audio/audio_processing_model.pkl'
+dataset_folder = './audio/dataset'  # shards Parquet de src/model/build_dataset.py, lidos por train_model.py
+
+# Espectrogramas das análises
+spectrogram_renderer = 'fast'  # 'fast' (imagem direta pela tabela de cores) ou 'figure' (eixos e legenda)
+spectrogram_width = 1024  # largura máxima em pixels (colunas de tempo); None mantém todos os quadros
+spectrogram_height = 512  # linhas de frequência em escala log; None mantém todos os bins
+
+# Cache da interface Streamlit (áudio decodificado, métricas e gráficos por hash do conteúdo)
+app_cache_ttl = 3600  # segundos até uma entrada expirar
+app_cache_max_entries = 16  # entradas por função; as mais antigas saem primeiro
+app_cache_max_bytes = 256 * 1024 * 1024  # limite em memória das pirâmides de picos e imagens da forma de onda
+
+# Instrumentação por etapa (JSON-lines); None desliga a coleta
+trace_file = None  # ex.: './audio/trace.jsonl'
+
 # Função para criar diretórios, se não existirem
 def create_directory_if_not_exists(directory):
     if not os.path.exists(directory):
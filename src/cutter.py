@@ -0,0 +1,96 @@
+import io
+import os
+import struct
+import ffmpeg
+import soundfile as sf
+from instrumentation import span
+from wavmap import open_audio
+
+# Containers PCM/sem perdas em que o soundfile posiciona a leitura na amostra exata
+SEEKABLE_FORMATS = ('WAV', 'WAVEX', 'RF64', 'W64', 'AIFF', 'FLAC', 'CAF')
+# Formatos de saída gravados pelo soundfile
+SOUNDFILE_OUTPUTS = {'wav': 'WAV', 'flac': 'FLAC'}
+# Formatos de saída gerados pelo ffmpeg (muxer por extensão)
+FFMPEG_OUTPUTS = {'wav': 'wav', 'flac': 'flac', 'mp3': 'mp3', 'ogg': 'ogg', 'opus': 'ogg', 'aac': 'adts'}
+
+def _extension(path):
+    return os.path.splitext(str(path))[1].lstrip('.').lower()
+
+def _seekable_info(input_path):
+    try:
+        info = sf.info(input_path)
+    except sf.LibsndfileError:
+        return None
+    return info if info.format in SEEKABLE_FORMATS else None
+
+def _cut_soundfile(input_path, info, start, end, output_format):
+    # Lê só os quadros pedidos: o custo não depende da duração do arquivo
+    start_frame = min(int(round(start * info.samplerate)), info.frames)
+    end_frame = min(int(round(end * info.samplerate)), info.frames)
+    # WAVs sem compressão são lidos pelo mapeamento de memória, só nos quadros do trecho
+    with open_audio(input_path) as f:
+        f.seek(start_frame)
+        data = f.read(end_frame - start_frame, dtype='float32', always_2d=True)
+    buffer = io.BytesIO()
+    subtype = info.subtype if sf.check_format(SOUNDFILE_OUTPUTS[output_format], info.subtype) else None
+    sf.write(buffer, data, info.samplerate, format=SOUNDFILE_OUTPUTS[output_format], subtype=subtype)
+    return buffer
+
+def _fix_wav_header(data):
+    # O ffmpeg não volta ao cabeçalho ao gravar num pipe; os tamanhos ficam 0xFFFFFFFF
+    data = bytearray(data)
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        if chunk_id == b'data':
+            struct.pack_into('<I', data, offset + 4, len(data) - offset - 8)
+            break
+        size = struct.unpack_from('<I', data, offset + 4)[0]
+        offset += 8 + size + size % 2
+    struct.pack_into('<I', data, 4, len(data) - 8)
+    return bytes(data)
+
+def _cut_ffmpeg(input_path, start, end, output_format, copy):
+    # -ss antes de -i: o ffmpeg busca direto na posição, sem decodificar o início.
+    # Com cópia do fluxo o corte cai na fronteira de quadro do codec; com
+    # recodificação a busca é exata na amostra.
+    output_args = {'format': FFMPEG_OUTPUTS[output_format]}
+    if copy:
+        output_args['acodec'] = 'copy'
+    stream = ffmpeg.input(str(input_path), ss=start, t=end - start).output('pipe:', vn=None, **output_args)
+    data, _ = stream.global_args('-nostats').run(capture_stdout=True, capture_stderr=True)
+    if output_format == 'wav':
+        data = _fix_wav_header(data)
+    return io.BytesIO(data)
+
+def cut_audio(input_path, start, end, output_format=None, exact=False):
+    """
+    Recorta o trecho [start, end) em segundos lendo apenas essa parte do arquivo.
+
+    Arquivos PCM e FLAC são lidos pelo soundfile a partir do quadro exato.
+    Formatos comprimidos passam pelo ffmpeg com busca na entrada: no mesmo
+    formato, o fluxo é copiado sem recodificar (bordas na fronteira de quadro
+    do codec, ~26 ms no MP3); com exact=True ou outro formato de saída, o
+    trecho é decodificado e recodificado com bordas exatas.
+
+    :param output_format: 'wav', 'flac', 'mp3', 'ogg', 'opus' ou 'aac';
+        None mantém o formato do arquivo de entrada.
+    :return: BytesIO com o trecho, posicionado no início.
+    """
+    if end <= start:
+        raise ValueError(f"Fim do corte ({end}) deve ser maior que o início ({start})")
+    output_format = output_format or _extension(input_path)
+    if output_format not in FFMPEG_OUTPUTS:
+        raise ValueError(f"Formato de saída não suportado: {output_format}")
+
+    with span('cut_audio', file=input_path, start=start, end=end) as current:
+        info = _seekable_info(input_path)
+        if info is not None and output_format in SOUNDFILE_OUTPUTS:
+            current.set(method='seek')
+            buffer = _cut_soundfile(input_path, info, start, end, output_format)
+        else:
+            copy = not exact and output_format == _extension(input_path)
+            current.set(method='copy' if copy else 'reencode')
+            buffer = _cut_ffmpeg(input_path, start, end, output_format, copy)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,99 @@
+import io
+import ffmpeg
+import numpy as np
+
+# Número de amostras enviadas ao ffmpeg por escrita
+CHUNK_SIZE = 65536
+
+class StreamEncoder:
+    """
+    Codifica áudio em float32 enviando PCM bruto direto para o stdin do ffmpeg,
+    sem arquivo WAV temporário.
+
+    :param output_file: Arquivo de saída; o formato vem da extensão (ex.: .mp3).
+    :param sr: Taxa de amostragem do áudio.
+    :param channels: Número de canais dos blocos enviados a write().
+    :param bitrate: Bitrate constante (ex.: '192k'); None usa o padrão do ffmpeg.
+    :param vbr_quality: Qualidade VBR do LAME (0 = melhor, 9 = menor); tem prioridade sobre bitrate.
+    """
+
+    def __init__(self, output_file, sr, channels=1, bitrate=None, vbr_quality=None, chunk_size=CHUNK_SIZE):
+        self.output_file = str(output_file)
+        self.channels = channels
+        self.chunk_size = chunk_size
+
+        output_args = {}
+        if vbr_quality is not None:
+            output_args['q:a'] = vbr_quality
+        elif bitrate is not None:
+            output_args['audio_bitrate'] = bitrate
+
+        stream = (
+            ffmpeg
+            .input('pipe:', format='f32le', ac=channels, ar=sr)
+            .output(self.output_file, **output_args)
+            .global_args('-loglevel', 'error', '-nostats')
+            .overwrite_output()
+        )
+        self.args = stream.get_args()
+        self.process = stream.run_async(pipe_stdin=True, pipe_stderr=True)
+
+    def write(self, block):
+        # Blocos mono em 1-D ou (amostras, canais) intercalados
+        block = np.asarray(block)
+        for start in range(0, len(block), self.chunk_size):
+            chunk = np.ascontiguousarray(block[start:start + self.chunk_size], dtype=np.float32)
+            self.process.stdin.write(chunk.tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        stderr = self.process.stderr.read()
+        self.process.stderr.close()
+        if self.process.wait() != 0:
+            raise ffmpeg.Error('ffmpeg', None, stderr)
+
+    def abort(self):
+        self.process.kill()
+        self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+def encode_audio(y, sr, output_file, bitrate=None, vbr_quality=None, chunk_size=CHUNK_SIZE):
+    y = np.asarray(y)
+    channels = 1 if y.ndim == 1 else y.shape[1]
+    with StreamEncoder(output_file, sr, channels=channels, bitrate=bitrate, vbr_quality=vbr_quality, chunk_size=chunk_size) as encoder:
+        encoder.write(y)
+
+def encode_to_bytes(y, sr, output_format='mp3', bitrate=None, vbr_quality=None):
+    # Codifica em memória (ex.: para download); WAV é gravado pelo soundfile, com cabeçalho completo
+    y = np.asarray(y, dtype=np.float32)
+    if output_format == 'wav':
+        import soundfile as sf
+        buffer = io.BytesIO()
+        sf.write(buffer, y, sr, format='WAV', subtype='PCM_16')
+        buffer.seek(0)
+        return buffer
+
+    channels = 1 if y.ndim == 1 else y.shape[1]
+    output_args = {'format': output_format}
+    if vbr_quality is not None:
+        output_args['q:a'] = vbr_quality
+    elif bitrate is not None:
+        output_args['audio_bitrate'] = bitrate
+    # communicate() escreve a entrada e lê a saída ao mesmo tempo, sem travar nos pipes
+    data, _ = (
+        ffmpeg
+        .input('pipe:', format='f32le', ac=channels, ar=sr)
+        .output('pipe:', **output_args)
+        .global_args('-nostats')
+        .run(input=np.ascontiguousarray(y).tobytes(), capture_stdout=True, capture_stderr=True)
+    )
+    return io.BytesIO(data)
@@ -1,23 +1,205 @@
 import os
+import re
+import struct
+import threading
+import concurrent.futures
 import ffmpeg
+import numpy as np
+from instrumentation import span
 
-def extract_audio(input_folder, output_folder):
-    print(f"Extraindo áudio dos vídeos em {os.listdir(input_folder)} para {output_folder}")
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.flv')
+
+# Formatos de amostra aceitos e o codec PCM correspondente
+SAMPLE_FORMATS = {
+    's16': 'pcm_s16le',
+    's24': 'pcm_s24le',
+    's32': 'pcm_s32le',
+    'f32': 'pcm_f32le',
+}
+# Subtipo do libsndfile de cada formato, para conferir um WAV já extraído
+SAMPLE_SUBTYPES = {
+    's16': 'PCM_16',
+    's24': 'PCM_24',
+    's32': 'PCM_32',
+    'f32': 'FLOAT',
+}
+
+# Amostras (por canal) lidas do pipe do ffmpeg por bloco
+DECODE_BLOCKSIZE = 1 << 18
+OUTPUT_STREAM_PATTERN = re.compile(r'Stream #\d+:\d+.*: Audio: pcm_f32le.*?, (\d+) Hz')
+
+def _read_wav_channels(stream):
+    # Canais do cabeçalho WAV que o ffmpeg escreve no pipe; None se o ffmpeg
+    # terminou sem saída (o erro vem de close)
+    riff = stream.read(12)
+    if len(riff) < 12:
+        return None
+    while True:
+        header = stream.read(8)
+        if len(header) < 8:
+            return None
+        chunk_id, size = header[:4], struct.unpack('<I', header[4:])[0]
+        if chunk_id == b'data':
+            return channels
+        body = stream.read(size + size % 2)
+        if chunk_id == b'fmt ':
+            channels = struct.unpack_from('<H', body, 2)[0]
+
+class DecodeStream:
+    """
+    Decodifica o áudio de qualquer arquivo suportado pelo ffmpeg direto para
+    blocos NumPy float32, por um pipe, sem gravar WAV intermediário.
+
+    :param input_path: Arquivo de vídeo ou áudio.
+    :param sample_rate: Taxa de saída; None mantém a original (lida do log do ffmpeg).
+    :param channels: Canais de saída; 1 faz a mixagem para mono; None mantém
+        todos os canais do arquivo.
+    """
+
+    def __init__(self, input_path, sample_rate=None, channels=1, blocksize=DECODE_BLOCKSIZE):
+        self.channels = channels
+        self.blocksize = blocksize
+        # Sem mixagem, a saída é um WAV: o cabeçalho informa quantos canais o arquivo tem
+        output_args = {'format': 'f32le', 'acodec': 'pcm_f32le', 'ac': channels} if channels else {'format': 'wav', 'acodec': 'pcm_f32le'}
+        if sample_rate is not None:
+            output_args['ar'] = sample_rate
+        self.process = (
+            ffmpeg
+            .input(str(input_path))
+            .output('pipe:', vn=None, **output_args)
+            .global_args('-nostats', '-hide_banner')
+            .run_async(pipe_stdout=True, pipe_stderr=True)
+        )
+        # O stderr é lido em paralelo: dele vem a taxa de saída, e um pipe cheio travaria o ffmpeg
+        self.stderr_lines = []
+        self.sample_rate = sample_rate
+        self._sample_rate_found = threading.Event()
+        self._stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_thread.start()
+        self._sample_rate_found.wait()
+        if self.channels is None:
+            self.channels = _read_wav_channels(self.process.stdout)
+        if self.sample_rate is None or self.channels is None:
+            self.close()
+
+    def _read_stderr(self):
+        for line in iter(self.process.stderr.readline, b''):
+            line = line.decode(errors='replace')
+            self.stderr_lines.append(line)
+            match = OUTPUT_STREAM_PATTERN.search(line)
+            if match and not self._sample_rate_found.is_set():
+                self.sample_rate = int(match.group(1))
+                self._sample_rate_found.set()
+        self._sample_rate_found.set()
+
+    def __iter__(self):
+        frame_bytes = 4 * self.channels
+        while True:
+            data = self.process.stdout.read(self.blocksize * frame_bytes)
+            if not data:
+                break
+            block = np.frombuffer(data[:len(data) - len(data) % frame_bytes], dtype=np.float32)
+            yield block if self.channels == 1 else block.reshape(-1, self.channels)
+
+    def close(self):
+        self.process.stdout.close()
+        returncode = self.process.wait()
+        self._stderr_thread.join()
+        self.process.stderr.close()
+        if returncode != 0 or self.sample_rate is None or self.channels is None:
+            raise ffmpeg.Error('ffmpeg', None, ''.join(self.stderr_lines).encode())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.process.kill()
+            self.process.wait()
+        return False
+
+def decode_audio(input_path, sample_rate=None, channels=1):
+    # Decodifica o arquivo inteiro para um único buffer em memória: 1-D em
+    # mono, (amostras, canais) nos demais
+    with DecodeStream(input_path, sample_rate, channels) as stream:
+        blocks = list(stream)
+    sr = stream.sample_rate
+    if not blocks:
+        return np.zeros(0 if stream.channels == 1 else (0, stream.channels), dtype=np.float32), sr
+    return np.concatenate(blocks), sr
+
+def is_up_to_date(input_path, output_path):
+    # O WAV só é reaproveitado se existir e for mais novo que o vídeo
+    return os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+def matches_output_options(output_path, sample_rate=None, channels=None, sample_format=None):
+    # O WAV foi gravado com as opções pedidas? Taxa e canais None aceitam
+    # qualquer valor (mantêm os do vídeo); o formato None é o s16 do ffmpeg
+    import soundfile as sf
+    try:
+        info = sf.info(output_path)
+    except (sf.LibsndfileError, RuntimeError):
+        return False
+    return ((sample_rate is None or info.samplerate == sample_rate)
+            and (channels is None or info.channels == channels)
+            and info.subtype == SAMPLE_SUBTYPES[sample_format or 's16'])
+
+def extract_audio_file(input_path, output_path, sample_rate=None, channels=None, sample_format=None, force=False):
+    if not force and is_up_to_date(input_path, output_path) and matches_output_options(output_path, sample_rate, channels, sample_format):
+        return {'input': input_path, 'output': output_path, 'status': 'skipped', 'error': None}
+
+    output_args = {'format': 'wav'}
+    if sample_rate is not None:
+        output_args['ar'] = sample_rate
+    if channels is not None:
+        output_args['ac'] = channels
+    if sample_format is not None:
+        output_args['acodec'] = SAMPLE_FORMATS[sample_format]
+
+    # Grava em um arquivo parcial e renomeia no final, para que uma extração
+    # interrompida nunca pareça atualizada
+    partial_path = output_path + '.part'
+    try:
+        with span('extract_audio', file=input_path):
+            ffmpeg.input(input_path).output(partial_path, vn=None, **output_args).overwrite_output().run(quiet=True)
+        os.replace(partial_path, output_path)
+        print(f"Áudio extraído de {os.path.basename(input_path)} para {output_path}")
+        return {'input': input_path, 'output': output_path, 'status': 'ok', 'error': None}
+    except ffmpeg.Error as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        error = e.stderr.decode(errors='replace').strip() if e.stderr else str(e)
+        print(f"Erro ao processar {os.path.basename(input_path)}: {error}")
+        return {'input': input_path, 'output': output_path, 'status': 'error', 'error': error}
+
+def extract_audio(input_folder, output_folder, max_workers=None, sample_rate=None, channels=None, sample_format=None, force=False):
+    print(f"Extraindo áudio dos vídeos em {input_folder} para {output_folder}")
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
         print(f"A pasta {output_folder} foi criada.")
 
-    for filename in os.listdir(input_folder):
-        if filename.endswith(('.mp4', '.mkv', '.avi', '.mov', '.flv')):
+    jobs = []
+    for filename in sorted(os.listdir(input_folder)):
+        if filename.endswith(VIDEO_EXTENSIONS):
             input_path = os.path.join(input_folder, filename)
             output_path = os.path.join(output_folder, os.path.splitext(filename)[0] + '.wav')
+            jobs.append((input_path, output_path))
+
+    # Cada extração é um processo ffmpeg; as threads só aguardam o término
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(extract_audio_file, input_path, output_path, sample_rate, channels, sample_format, force)
+            for input_path, output_path in jobs
+        ]
+        results = [future.result() for future in futures]
 
-            try:
-                ffmpeg.input(input_path).output(output_path).run()
-                print(f"Áudio extraído de {filename} para {output_path}")
-            except ffmpeg.Error as e:
-                print(f"Erro ao processar {filename}: {e}")
+    skipped = sum(1 for result in results if result['status'] == 'skipped')
+    failed = sum(1 for result in results if result['status'] == 'error')
+    print(f"Extração concluída: {len(results) - skipped - failed} extraído(s), {skipped} já atualizado(s), {failed} com erro")
+    return results
 
 if __name__ == "__main__":
-    from config import input_folder, staging_folder
-    extract_audio(input_folder, staging_folder)
+    from config import input_folder, staging_folder, extraction_workers, extraction_sample_rate, extraction_channels, extraction_sample_format
+    extract_audio(input_folder, staging_folder, extraction_workers, extraction_sample_rate, extraction_channels, extraction_sample_format)
@@ -0,0 +1,132 @@
+import concurrent.futures
+import logging
+import os
+import socket
+import time
+from jobqueue import file_signature
+from metrics_store import get_store
+
+class IngestService:
+    """
+    Serviço de ingestão contínua: observa a pasta de vídeos, enfileira os
+    arquivos novos ou alterados numa JobQueue e executa as etapas com os
+    executores de um Pipeline da CLI. Cada etapa concluída enfileira as
+    seguintes na mesma transação, então o serviço pode ser interrompido a
+    qualquer momento e retomado sem refazer o que já terminou.
+
+    Um arquivo só entra na fila depois de duas varreduras seguidas com o mesmo
+    tamanho e data de modificação, para não pegar vídeos ainda sendo copiados.
+
+    :param queue: JobQueue compartilhada.
+    :param pipeline: Pipeline da CLI (executores e encadeamento das etapas).
+    :param sources: Função que devolve os vídeos candidatos da pasta observada.
+    :param first_step: 'extract' ou 'fused'.
+    :param jobs: Máximo de jobs em execução ao mesmo tempo.
+    """
+
+    def __init__(self, queue, pipeline, sources, first_step, jobs, poll_interval, lease_seconds, max_attempts, status_interval=60):
+        self.queue = queue
+        self.pipeline = pipeline
+        self.sources = sources
+        self.first_step = first_step
+        self.jobs = jobs
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.status_interval = status_interval
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.claimed = {}  # future -> id do job
+        self.counts = {'ok': 0, 'skipped': 0, 'error': 0}
+        self._seen = {}
+
+    def scan(self, require_stable=True):
+        current = {}
+        for path in self.sources():
+            try:
+                current[path] = file_signature(path)
+            except FileNotFoundError:
+                continue  # Removido entre a listagem e o stat
+        stable = [(self.first_step, path, signature) for path, signature in current.items()
+                  if not require_stable or self._seen.get(path) == signature]
+        self._seen = current
+        added = self.queue.enqueue_many(stable)
+        if added:
+            logging.info(f"{added} arquivo(s) novo(s) na fila")
+        return added
+
+    def _fill(self):
+        while len(self.claimed) < self.jobs:
+            job = self.queue.claim(self.worker, self.lease_seconds, self.max_attempts)
+            if job is None:
+                return
+            self.claimed[self.pipeline.submit(job['step'], job['input'])] = job['id']
+
+    def _finish(self, future):
+        job_id = self.claimed.pop(future)
+        step, input_path = self.pipeline.pending.pop(future)
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'input': input_path, 'output': None, 'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+        self.counts[result['status']] += 1
+        elapsed = result.get('elapsed')
+        if result['status'] == 'error':
+            logging.error(f"[{step}] {input_path}: {result['error']}")
+            self.queue.fail(job_id, result['error'], self.max_attempts, elapsed)
+            return
+        if (step.startswith('analyze') or step == 'fused') and result['status'] == 'ok':
+            # Regravar as métricas de um job repetido substitui a linha anterior
+            get_store().append(result['input'], result['stage'], result['metrics'])
+        next_jobs = []
+        for next_step, path in self.pipeline.next_steps(step, result):
+            try:
+                next_jobs.append((next_step, path, file_signature(path)))
+            except FileNotFoundError:
+                logging.error(f"[{next_step}] Saída de {step} não encontrada: {path}")
+        self.queue.complete(job_id, result.get('output'), elapsed, next_jobs)
+
+    def log_status(self):
+        stats = self.queue.stats()
+        depth = sum(values['pending'] + values['running'] for values in stats.values())
+        throughput = ', '.join(f"{step} {values['throughput']:.1f}/min" for step, values in sorted(stats.items()) if values['throughput'])
+        logging.info(f"Fila: {depth} job(s) pendente(s); {self.counts['ok']} ok, {self.counts['skipped']} pulados, "
+                     f"{self.counts['error']} erros nesta execução" + (f"; vazão {throughput}" if throughput else ''))
+
+    def run(self, once=False):
+        """
+        Executa até ser interrompido. Com once=True, enfileira o que já está na
+        pasta (sem esperar a segunda varredura) e sai quando a fila esvazia.
+
+        :return: Contagem de resultados ('ok', 'skipped', 'error') desta execução.
+        """
+        logging.info(f"Ingestão iniciada ({self.worker}), {self.jobs} job(s) simultâneo(s)")
+        last_scan = last_status = 0.0
+        try:
+            if once:
+                self.scan(require_stable=False)
+            while True:
+                now = time.monotonic()
+                if not once and now - last_scan >= self.poll_interval:
+                    self.scan()
+                    last_scan = now
+                self._fill()
+                if not self.claimed:
+                    if once:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                done, _ = concurrent.futures.wait(self.claimed, timeout=self.poll_interval,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    self._finish(future)
+                self.queue.heartbeat(self.worker, self.lease_seconds)
+                if time.monotonic() - last_status >= self.status_interval:
+                    self.log_status()
+                    last_status = time.monotonic()
+        finally:
+            # Jobs interrompidos voltam para a fila sem esperar o lease vencer
+            self.pipeline.threads.shutdown(wait=False, cancel_futures=True)
+            self.pipeline.processes.shutdown(wait=False, cancel_futures=True)
+            self.queue.release(self.worker)
+            self.log_status()
+        return self.counts
@@ -0,0 +1,151 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+# Caminho do arquivo JSON-lines; herdado pelos processos de trabalho via ambiente
+TRACE_ENV = 'AUDIOMETRICS_TRACE'
+
+_trace_path = os.environ.get(TRACE_ENV) or None
+_write_lock = threading.Lock()
+_local = threading.local()
+
+def enable_tracing(path):
+    global _trace_path
+    _trace_path = os.path.abspath(path)
+    os.environ[TRACE_ENV] = _trace_path
+
+def disable_tracing():
+    global _trace_path
+    _trace_path = None
+    os.environ.pop(TRACE_ENV, None)
+
+def tracing_enabled():
+    return _trace_path is not None
+
+def _io_counters():
+    # Bytes lidos e escritos pelo processo (inclui cache de página), se o sistema
+    # expuser; no Linux entram também os filhos já encerrados e aguardados (ffmpeg)
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def _children_cpu():
+    # CPU (usuário + sistema) dos processos filhos encerrados e aguardados
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """
+    Mede uma etapa: tempo de parede, tempo de CPU da thread, tempo de CPU dos
+    processos filhos (o ffmpeg), pico de RSS do processo e bytes lidos/escritos.
+    A CPU dos filhos, os contadores de E/S (process_read_bytes e
+    process_write_bytes) e o pico de RSS são do processo inteiro, então spans
+    simultâneos em threads se sobrepõem. Um filho só é contado depois de
+    encerrado e aguardado, no span em que isso acontece.
+    """
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.read_start, self.write_start = _io_counters()
+        self.timestamp = time.time()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        self.children_cpu_start = _children_cpu()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.thread_time() - self.cpu_start
+        children_cpu = _children_cpu() - self.children_cpu_start
+        read_end, write_end = _io_counters()
+        _local.stack.pop()
+
+        record = {
+            'name': self.name,
+            'parent': self.parent,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'ts': self.timestamp,
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'children_cpu_s': children_cpu,
+            'peak_rss_mb': _peak_rss_mb(),
+            'process_read_bytes': read_end - self.read_start if read_end is not None else None,
+            'process_write_bytes': write_end - self.write_start if write_end is not None else None,
+            'status': 'error' if exc_type else 'ok',
+        }
+        record.update({key: str(value) if not isinstance(value, (int, float, bool)) else value for key, value in self.attrs.items()})
+        _write(record)
+        return False
+
+def span(name, **attrs):
+    # Quando a coleta está desligada, devolve um objeto vazio compartilhado
+    if _trace_path is None:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+def _write(record):
+    path = _trace_path
+    if path is None:
+        return
+    line = json.dumps(record) + '\n'
+    # Abertura em modo append: linhas curtas de vários processos não se misturam
+    with _write_lock:
+        with open(path, 'a') as f:
+            f.write(line)
+
+def read_spans(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def export_chrome_trace(jsonl_path, output_path):
+    # Formato "trace event" do Chrome (chrome://tracing, Perfetto)
+    events = []
+    for record in read_spans(jsonl_path):
+        args = {key: value for key, value in record.items() if key not in ('name', 'pid', 'tid', 'ts', 'wall_s')}
+        events.append({
+            'name': record['name'],
+            'cat': 'pipeline',
+            'ph': 'X',
+            'ts': int(record['ts'] * 1e6),
+            'dur': int(record['wall_s'] * 1e6),
+            'pid': record['pid'],
+            'tid': record['tid'],
+            'args': args,
+        })
+    with open(output_path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return output_path
@@ -0,0 +1,145 @@
+import contextlib
+import os
+import sqlite3
+import time
+
+# Estados de um job; 'running' com o lease vencido volta a ser reivindicável
+STATUSES = ('pending', 'running', 'done', 'error')
+
+def file_signature(path):
+    # O mesmo arquivo alterado no disco gera outro job
+    stat = os.stat(path)
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+class JobQueue:
+    """
+    Fila persistente de jobs (etapa, arquivo) em SQLite, compartilhada entre
+    processos. Cada job é identificado pela etapa, pelo caminho e pela
+    assinatura do arquivo (tamanho e data de modificação): reenfileirar um
+    arquivo inalterado não tem efeito, então etapas concluídas não são refeitas
+    depois de uma queda.
+
+    Um worker reivindica um job com um lease que deve renovar enquanto o
+    executa; se o processo cair, o lease vence e o job volta para a fila.
+
+    :param db_path: Caminho do banco SQLite.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = os.path.abspath(db_path)
+        folder = os.path.dirname(self.db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, step TEXT, input TEXT, signature TEXT, '
+                         'status TEXT, attempts INTEGER DEFAULT 0, worker TEXT, lease_expires REAL, created_at REAL, '
+                         'started_at REAL, finished_at REAL, elapsed REAL, output TEXT, error TEXT, '
+                         'UNIQUE (step, input, signature))')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _insert(self, conn, jobs, now):
+        cursor = conn.executemany('INSERT OR IGNORE INTO jobs (step, input, signature, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                                  [(step, os.path.abspath(path), signature, 'pending', now) for step, path, signature in jobs])
+        return cursor.rowcount
+
+    def enqueue(self, step, path, signature=None):
+        return self.enqueue_many([(step, path, signature or file_signature(path))]) > 0
+
+    def enqueue_many(self, jobs):
+        # jobs: (etapa, caminho, assinatura); devolve quantos eram novos
+        jobs = list(jobs)
+        if not jobs:
+            return 0
+        with self._connect() as conn:
+            return self._insert(conn, jobs, time.time())
+
+    def claim(self, worker, lease_seconds, max_attempts=1):
+        """
+        Reivindica o job pendente mais antigo (ou um em execução com lease
+        vencido). Jobs cujo lease venceu max_attempts vezes são dados como falhos.
+
+        :return: Dicionário com id, step, input e attempts, ou None se a fila estiver vazia.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # Transação de escrita desde a leitura: dois workers nunca pegam o mesmo job
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute("UPDATE jobs SET status = 'error', error = 'Lease vencido (processo interrompido)', finished_at = ? "
+                         "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?", (now, now, max_attempts))
+            row = conn.execute("SELECT id, step, input, attempts FROM jobs WHERE status = 'pending' "
+                               "OR (status = 'running' AND lease_expires < ?) ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_expires = ?, "
+                         "started_at = ? WHERE id = ?", (worker, now + lease_seconds, now, row[0]))
+        return {'id': row[0], 'step': row[1], 'input': row[2], 'attempts': row[3] + 1}
+
+    def heartbeat(self, worker, lease_seconds):
+        # Renova o lease de todos os jobs em execução do worker
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET lease_expires = ? WHERE status = 'running' AND worker = ?",
+                         (time.time() + lease_seconds, worker))
+
+    def complete(self, job_id, output=None, elapsed=None, next_jobs=()):
+        # Conclusão e próximas etapas na mesma transação: uma queda entre as
+        # duas nunca perde a continuação do arquivo
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', finished_at = ?, elapsed = ?, output = ?, error = NULL WHERE id = ?",
+                         (now, elapsed, output, job_id))
+            self._insert(conn, next_jobs, now)
+
+    def fail(self, job_id, error, max_attempts=1, elapsed=None):
+        # Volta para a fila enquanto houver tentativas; depois fica como erro
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'error' END, "
+                         "finished_at = ?, elapsed = ?, error = ? WHERE id = ?", (max_attempts, time.time(), elapsed, error, job_id))
+
+    def release(self, worker):
+        # Devolve à fila os jobs em execução de um worker encerrado normalmente
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'pending', attempts = MAX(attempts - 1, 0), worker = NULL "
+                         "WHERE status = 'running' AND worker = ?", (worker,))
+
+    def depth(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')").fetchone()[0]
+
+    def stats(self, window=300):
+        """
+        Profundidade e vazão da fila por etapa.
+
+        :param window: Janela, em segundos, usada para a vazão e o tempo médio.
+        :return: Dicionário {etapa: {pending, running, done, error, throughput
+            (jobs/min na janela), mean_elapsed (s), oldest_pending (s)}}.
+        """
+        now = time.time()
+        steps = {}
+        with self._connect() as conn:
+            for step, status, count in conn.execute('SELECT step, status, COUNT(*) FROM jobs GROUP BY step, status'):
+                steps.setdefault(step, dict.fromkeys(STATUSES, 0))[status] = count
+            for step, count, mean_elapsed in conn.execute("SELECT step, COUNT(*), AVG(elapsed) FROM jobs WHERE status = 'done' "
+                                                          "AND finished_at >= ? GROUP BY step", (now - window,)):
+                steps[step]['throughput'] = count * 60 / window
+                steps[step]['mean_elapsed'] = mean_elapsed
+            for step, oldest in conn.execute("SELECT step, MIN(created_at) FROM jobs WHERE status = 'pending' GROUP BY step"):
+                steps[step]['oldest_pending'] = now - oldest
+        for values in steps.values():
+            values.setdefault('throughput', 0.0)
+            values.setdefault('mean_elapsed', None)
+            values.setdefault('oldest_pending', None)
+        return steps
+
+    def failures(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT step, input, error FROM jobs WHERE status = 'error' ORDER BY id").fetchall()
@@ -0,0 +1,221 @@
+import functools
+import numpy as np
+
+# Medição de loudness da ITU-R BS.1770-4 / EBU R128: blocos de 400 ms com
+# 75% de sobreposição, porta absoluta em -70 LUFS e porta relativa em -10 LU
+BLOCK_SECONDS = 0.4
+SUBBLOCKS_PER_BLOCK = 4
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+# Histograma das loudness de bloco: memória fixa, qualquer que seja a duração.
+# Começa bem abaixo da porta absoluta: depois de um ganho de normalização, blocos
+# que estavam abaixo de -70 LUFS passam a contar e precisam continuar no histograma
+HISTOGRAM_MIN = -150.0
+HISTOGRAM_MAX = 10.0
+HISTOGRAM_STEP = 0.01
+# Refinamentos do ganho de normalização (as portas mudam com o ganho)
+GAIN_ITERATIONS = 4
+# Taps por fase do filtro de interpolação do true peak (48 taps em 4x, como no anexo 2)
+TRUE_PEAK_TAPS_PER_PHASE = 12
+# Amostras por trecho na busca do true peak
+TRUE_PEAK_CHUNK = 4096
+
+@functools.lru_cache(maxsize=16)
+def k_weighting(sr):
+    """
+    Filtro de ponderação K (pré-filtro de prateleira + passa-altas RLB) como
+    seções de segunda ordem, com os coeficientes recalculados para a taxa sr
+    pela mesma transformação bilinear do libebur128.
+    """
+    f0, gain, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sr)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sr)
+    a0 = 1 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([shelf, highpass])
+
+@functools.lru_cache(maxsize=16)
+def true_peak_phases(sr):
+    # Sobreamostragem 4x abaixo de 96 kHz, 2x até 192 kHz; uma linha de taps por fase
+    from scipy.signal import firwin
+    factor = 4 if sr < 96000 else 2 if sr < 192000 else 1
+    if factor == 1:
+        return np.ones((1, 1))
+    taps = firwin(TRUE_PEAK_TAPS_PER_PHASE * factor, 1.0 / factor) * factor
+    return taps.reshape(TRUE_PEAK_TAPS_PER_PHASE, factor).T
+
+@functools.lru_cache(maxsize=16)
+def _interpolator(sr):
+    # Matriz (taps, fases) aplicada a janelas deslizantes do sinal, e o maior
+    # ganho possível de uma fase (norma L1), que limita o pico interpolado
+    phases = true_peak_phases(sr)
+    return phases[:, ::-1].T.copy(), float(np.abs(phases).sum(axis=1).max())
+
+def _loudness(energy):
+    with np.errstate(divide='ignore'):
+        return -0.691 + 10 * np.log10(energy)
+
+def _histogram_bins():
+    return int(round((HISTOGRAM_MAX - HISTOGRAM_MIN) / HISTOGRAM_STEP))
+
+def _histogram_index(loudness):
+    return np.minimum(((loudness - HISTOGRAM_MIN) / HISTOGRAM_STEP).astype(int), _histogram_bins() - 1)
+
+def _gated_loudness(counts, energies, gain_db=0.0):
+    # Loudness integrada dos histogramas (..., bins) depois de um ganho de
+    # gain_db, com as duas portas aplicadas ao sinal já amplificado; -inf onde
+    # nenhum bloco passa das portas (silêncio)
+    bins = np.arange(counts.shape[-1])
+    gain_db = np.asarray(gain_db, dtype=np.float64)
+    absolute = np.ceil((ABSOLUTE_GATE - gain_db - HISTOGRAM_MIN) / HISTOGRAM_STEP - 1e-6)
+    above = bins >= absolute[..., None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gate = _loudness((energies * above).sum(axis=-1) / (counts * above).sum(axis=-1)) + RELATIVE_GATE
+    first = np.clip(np.ceil((np.nan_to_num(gate, nan=HISTOGRAM_MAX) - HISTOGRAM_MIN) / HISTOGRAM_STEP), 0, counts.shape[-1])
+    above = above & (bins >= np.asarray(first)[..., None])
+    counts, energies = (counts * above).sum(axis=-1), (energies * above).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, _loudness(energies / np.maximum(counts, 1)) + gain_db, -np.inf)
+
+def _block_energies(subblocks):
+    # Blocos de 400 ms: média de SUBBLOCKS_PER_BLOCK sub-blocos consecutivos (último eixo)
+    from numpy.lib.stride_tricks import sliding_window_view
+    if subblocks.shape[-1] < SUBBLOCKS_PER_BLOCK:
+        return subblocks[..., :0]
+    return sliding_window_view(subblocks, SUBBLOCKS_PER_BLOCK, axis=-1).mean(axis=-1)
+
+def _interpolated_peak(window, interpolator):
+    # Maior valor absoluto das fases interpoladas de uma janela (amostras, ...)
+    # Janelas copiadas para um array contíguo: o produto vai para o BLAS
+    from numpy.lib.stride_tricks import sliding_window_view
+    frames = np.ascontiguousarray(sliding_window_view(window, interpolator.shape[0], axis=0))
+    return np.max(np.abs(frames.reshape(-1, interpolator.shape[0]) @ interpolator))
+
+class LoudnessMeter:
+    """
+    Loudness integrada (LUFS) e true peak (dBTP) calculados bloco a bloco, numa
+    única passada e com memória constante. Os filtros carregam o estado entre
+    blocos, então dividir o sinal em blocos de qualquer tamanho dá o mesmo
+    resultado. As portas são aplicadas sobre um histograma das loudness de
+    bloco com resolução de HISTOGRAM_STEP LU.
+
+    :param sr: Taxa de amostragem.
+    :param channels: Número de canais (todos com peso 1, como L, R e C).
+    """
+
+    def __init__(self, sr, channels=1):
+        self.sr = sr
+        self.channels = channels
+        self.sos = k_weighting(sr)
+        self.filter_state = np.zeros((self.sos.shape[0], 2, channels))
+        self.subblock = int(round(sr * BLOCK_SECONDS / SUBBLOCKS_PER_BLOCK))
+        self.pending = np.zeros((0, channels))  # amostras filtradas que ainda não fecham um sub-bloco
+        self.recent = np.zeros(0)  # energias dos últimos sub-blocos, para os blocos sobrepostos
+
+        self.interpolator, self.max_gain = _interpolator(sr)
+        self.peak_history = np.zeros((self.interpolator.shape[0] - 1, channels))
+        self.peak = 0.0
+
+        self.counts = np.zeros(_histogram_bins(), dtype=np.int64)
+        self.energies = np.zeros(_histogram_bins())
+
+    def process(self, block):
+        from scipy.signal import sosfilt
+        block = np.asarray(block, dtype=np.float64).reshape(len(block), self.channels)
+        if not len(block):
+            return
+
+        self._update_true_peak(block)
+
+        # Energia média de cada sub-bloco de 100 ms do sinal ponderado
+        weighted, self.filter_state = sosfilt(self.sos, block, axis=0, zi=self.filter_state)
+        weighted = np.concatenate([self.pending, weighted]) if len(self.pending) else weighted
+        usable = len(weighted) - len(weighted) % self.subblock
+        self.pending = weighted[usable:]
+        if not usable:
+            return
+        subblocks = (weighted[:usable] ** 2).reshape(-1, self.subblock, self.channels).mean(axis=1).sum(axis=1)
+
+        # Os últimos sub-blocos ficam guardados para os blocos sobrepostos seguintes
+        series = np.concatenate([self.recent, subblocks])
+        self._accumulate(_block_energies(series))
+        self.recent = series[-(SUBBLOCKS_PER_BLOCK - 1):]
+
+    def _update_true_peak(self, block):
+        # Interpola só os trechos que ainda podem superar o pico atual (pico
+        # das amostras x ganho máximo do interpolador), começando pelos mais
+        # altos; o resultado é o mesmo de interpolar o sinal inteiro
+        self.peak = max(self.peak, float(np.max(np.abs(block))))
+        taps = self.interpolator.shape[0]
+        padded = np.concatenate([self.peak_history, block])
+        self.peak_history = padded[len(padded) - (taps - 1):]
+        if taps == 1:
+            return
+
+        chunks = -(-len(block) // TRUE_PEAK_CHUNK)
+        chunk_peaks = np.zeros(chunks * TRUE_PEAK_CHUNK)
+        chunk_peaks[:len(block)] = np.abs(block).max(axis=1)
+        chunk_peaks = chunk_peaks.reshape(chunks, TRUE_PEAK_CHUNK).max(axis=1)
+        for c in np.argsort(chunk_peaks)[::-1]:
+            if chunk_peaks[c] * self.max_gain <= self.peak:
+                break
+            window = padded[c * TRUE_PEAK_CHUNK:(c + 1) * TRUE_PEAK_CHUNK + taps - 1]
+            self.peak = max(self.peak, float(_interpolated_peak(window, self.interpolator)))
+
+    def _accumulate(self, block_energies):
+        above = _loudness(block_energies) >= HISTOGRAM_MIN
+        index = _histogram_index(_loudness(block_energies[above]))
+        self.counts += np.bincount(index, minlength=len(self.counts))
+        self.energies += np.bincount(index, weights=block_energies[above], minlength=len(self.counts))
+
+    def integrated_loudness(self, gain_db=0.0):
+        # Loudness do sinal multiplicado por 10 ** (gain_db / 20); -inf se nenhum
+        # bloco passar da porta absoluta (silêncio)
+        return float(_gated_loudness(self.counts, self.energies, gain_db))
+
+    def true_peak(self):
+        with np.errstate(divide='ignore'):
+            return float(20 * np.log10(self.peak))
+
+def measure_loudness(y, sr):
+    # (LUFS integrado, dBTP) de um sinal em memória; mono em 1-D ou (amostras, canais)
+    y = np.asarray(y)
+    meter = LoudnessMeter(sr, channels=1 if y.ndim == 1 else y.shape[1])
+    meter.process(y)
+    return meter.integrated_loudness(), meter.true_peak()
+
+def loudness_gain(meter, target, true_peak_ceiling=-1.0):
+    """
+    Ganho linear que leva a loudness integrada medida por meter ao alvo,
+    reduzido se necessário para que o true peak não passe do teto. Silêncio
+    digital (nenhum bloco acima de HISTOGRAM_MIN) não recebe ganho.
+
+    Os blocos que passam das portas dependem do nível, então o ganho é
+    refinado medindo de novo a loudness do sinal já amplificado: blocos abaixo
+    de -70 LUFS antes do ganho (pausas, ruído de fundo) podem passar a contar.
+    """
+    if not meter.counts.any():
+        return 1.0
+    # Primeira estimativa só com a porta relativa: um sinal baixo pode estar
+    # inteiro abaixo de -70 LUFS antes do ganho
+    floor_db = ABSOLUTE_GATE - HISTOGRAM_MIN
+    gain_db = target - (meter.integrated_loudness(floor_db) - floor_db)
+    for _ in range(GAIN_ITERATIONS):
+        loudness = meter.integrated_loudness(gain_db)
+        if not np.isfinite(loudness):
+            break  # Atenuação que deixaria todos os blocos abaixo da porta absoluta
+        step = target - loudness
+        gain_db += step
+        if abs(step) < HISTOGRAM_STEP:
+            break
+    true_peak = meter.true_peak()
+    if np.isfinite(true_peak):
+        gain_db = min(gain_db, true_peak_ceiling - true_peak)
+    return float(10 ** (gain_db / 20))
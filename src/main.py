@@ -1,58 +1,168 @@
 import logging
 import os
+import time
 import concurrent.futures
-import librosa
-from extractor import extract_audio
-from analyzer import save_audio_analysis, analyze_audio_for_parameters
+import soundfile as sf
+from extractor import extract_audio, decode_audio
+from analyzer import save_audio_analysis, save_array_analysis, analyze_audio_for_parameters, stream_audio_features
 from enhancer import AudioProcessor
-from pydub import AudioSegment
-from config import create_directory_if_not_exists, input_folder, staging_folder, treated_folder, converted_folder, noise_reduction_prop, low_cutoff_frequency, high_cutoff_frequency
+from cache import get_cache
+from metrics_store import get_store
+from instrumentation import span, enable_tracing, export_chrome_trace
+from config import create_directory_if_not_exists, input_folder, staging_folder, treated_folder, converted_folder, noise_reduction_prop, low_cutoff_frequency, high_cutoff_frequency, treatment_mode, treatment_workers, mp3_bitrate, mp3_vbr_quality, loudness_target, true_peak_ceiling, extraction_workers, extraction_sample_rate, extraction_channels, extraction_sample_format, legacy_metrics_txt, streaming_min_duration, trace_file
 
 # Configuração do logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def init_worker():
+    # Importa as bibliotecas pesadas uma única vez por processo de trabalho
+    import librosa  # noqa: F401
+    import noisereduce  # noqa: F401
+
 def process_file(processor, input_path, treated_path):
+    start = time.perf_counter()
     try:
         logging.info(f"Tratando o áudio: {input_path}")
+        with span('process_file', file=input_path):
+            treat_file(processor, input_path, treated_path)
+        status, error = 'ok', None
+    except Exception as e:
+        logging.error(f"Erro ao processar arquivo: {e}")
+        status, error = 'error', f"{type(e).__name__}: {e}"
+    return {'input': input_path, 'output': treated_path, 'status': status, 'error': error, 'elapsed': time.perf_counter() - start}
+
+def treat_file(processor, input_path, treated_path):
+    if sf.info(input_path).duration >= streaming_min_duration:
+        # Gravações longas são analisadas e tratadas em blocos
+        _, metrics, _ = stream_audio_features(input_path)
+        processor.enhance_file_streaming(input_path, metrics, treated_path, noise_reduction_prop, low_cutoff_frequency, high_cutoff_frequency)
+    else:
         y, sr, metrics = analyze_audio_for_parameters(input_path)
         processor.enhance_audio(y, sr, metrics, treated_path, noise_reduction_prop, low_cutoff_frequency, high_cutoff_frequency)
+
+def process_video_fused(processor, video_path, staging_path, treated_path, keep_staging=False):
+    """
+    Modo fundido: o ffmpeg decodifica o áudio do vídeo direto para um buffer
+    NumPy, e esse único buffer alimenta métricas, espectrograma e tratamento.
+    O WAV de staging só é gravado com keep_staging=True.
+
+    Os canais e a taxa são os da extração (config.py), e as métricas e o
+    tratamento usam o sinal como no caminho normal (loudness nos canais,
+    demais métricas e tratamento na média deles), então os resultados não
+    dependem do modo. Sem o WAV de staging, as métricas 'original' ficam
+    registradas com o caminho do vídeo.
+    """
+    start = time.perf_counter()
+    metrics = None
+    try:
+        logging.info(f"Processando (modo fundido): {video_path}")
+        with span('process_video_fused', file=video_path):
+            with span('decode', file=video_path):
+                y, sr = decode_audio(video_path, sample_rate=extraction_sample_rate, channels=extraction_channels)
+            if keep_staging:
+                with span('write_staging', file=staging_path):
+                    sf.write(staging_path, y, sr)
+            # Leiaute do librosa (canais, amostras), como load_audio(mono=False)
+            y = y.T
+            analysis_folder = os.path.join(os.path.dirname(staging_path), 'analysis')
+            create_directory_if_not_exists(analysis_folder)
+            metrics = save_array_analysis(y, sr, staging_path, analysis_folder, stage='original', write_txt=legacy_metrics_txt)
+            if y.ndim > 1:
+                y = y.mean(axis=0)
+            processor.enhance_audio(y, sr, metrics, treated_path, noise_reduction_prop, low_cutoff_frequency, high_cutoff_frequency)
+        status, error = 'ok', None
     except Exception as e:
-        logging.error(f"Erro ao processar arquivo: {e}")
+        logging.error(f"Erro ao processar {os.path.basename(video_path)}: {e}")
+        status, error = 'error', f"{type(e).__name__}: {e}"
+    return {'input': staging_path if keep_staging else video_path, 'output': treated_path, 'stage': 'original', 'metrics': metrics,
+            'status': status, 'error': error, 'elapsed': time.perf_counter() - start}
+
+def create_executor(mode, max_workers=None):
+    if mode == 'process':
+        return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker)
+    if mode == 'thread':
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"Modo de execução inválido: {mode}")
 
-def treat_audio_concurrently(input_folder, treated_folder, processor):
+def treat_audio_concurrently(input_folder, treated_folder, processor, mode=treatment_mode, max_workers=treatment_workers):
     create_directory_if_not_exists(input_folder)
     create_directory_if_not_exists(treated_folder)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = []
-        for filename in os.listdir(input_folder):
-            if filename.endswith('.wav'):
-                input_path = os.path.join(input_folder, filename)
-                treated_path = os.path.join(treated_folder, filename.replace('.wav', '.mp3'))
-                futures.append(executor.submit(process_file, processor, input_path, treated_path))
+    jobs = []
+    for filename in sorted(os.listdir(input_folder)):
+        if filename.endswith('.wav'):
+            input_path = os.path.join(input_folder, filename)
+            treated_path = os.path.join(treated_folder, filename.replace('.wav', '.mp3'))
+            jobs.append((input_path, treated_path))
+
+    results = []
+    with create_executor(mode, max_workers) as executor:
+        futures = [executor.submit(process_file, processor, input_path, treated_path) for input_path, treated_path in jobs]
 
-        for future in concurrent.futures.as_completed(futures):
+        # Resultados na mesma ordem dos arquivos de entrada
+        for (input_path, treated_path), future in zip(jobs, futures):
             try:
-                future.result()
+                results.append(future.result())
             except Exception as e:
                 logging.error(f"Erro ao processar arquivo: {e}")
+                results.append({'input': input_path, 'output': treated_path, 'status': 'error', 'error': f"{type(e).__name__}: {e}", 'elapsed': None})
+
+    failures = sum(1 for result in results if result['status'] != 'ok')
+    logging.info(f"Tratamento concluído: {len(results) - failures} arquivo(s) com sucesso, {failures} com erro")
+    return results
 
 def convert_audio_to_mp3(input_folder, converted_folder):
     create_directory_if_not_exists(input_folder)
     create_directory_if_not_exists(converted_folder)
 
-    for filename in os.listdir(input_folder):
+    results = []
+    for filename in sorted(os.listdir(input_folder)):
         if filename.endswith('.wav'):
             input_path = os.path.join(input_folder, filename)
             converted_path = os.path.join(converted_folder, filename.replace('.wav', '.mp3'))
+            results.append(convert_file(input_path, converted_path))
+    return results
 
-            try:
-                logging.info(f"Convertendo o áudio: {input_path}")
+def convert_file(input_path, converted_path):
+    start = time.perf_counter()
+    try:
+        logging.info(f"Convertendo o áudio: {input_path}")
+        from pydub import AudioSegment
+        with span('convert_audio_to_mp3', file=input_path):
+            with span('decode', file=input_path):
                 audio = AudioSegment.from_wav(input_path)
+            with span('encode', file=converted_path):
                 audio.export(converted_path, format='mp3')
-                logging.info(f"Áudio convertido salvo em {converted_path}")
-            except Exception as e:
-                logging.error(f"Erro ao converter {filename}: {e}")
+        logging.info(f"Áudio convertido salvo em {converted_path}")
+        status, error = 'ok', None
+    except Exception as e:
+        logging.error(f"Erro ao converter {os.path.basename(input_path)}: {e}")
+        status, error = 'error', f"{type(e).__name__}: {e}"
+    return {'input': input_path, 'output': converted_path, 'status': status, 'error': error, 'elapsed': time.perf_counter() - start}
+
+def analyze_file(input_path, stage):
+    start = time.perf_counter()
+    analysis_folder = os.path.join(os.path.dirname(input_path), 'analysis')
+    metrics = None
+    try:
+        create_directory_if_not_exists(analysis_folder)
+        logging.info(f"Analisando o áudio ({stage}): {input_path}")
+        metrics = save_audio_analysis(input_path, analysis_folder, stage=stage, cache=get_cache(), write_txt=legacy_metrics_txt)
+        status, error = 'ok', None
+    except Exception as e:
+        logging.error(f"Erro ao analisar {os.path.basename(input_path)}: {e}")
+        status, error = 'error', f"{type(e).__name__}: {e}"
+    return {'input': input_path, 'output': analysis_folder, 'stage': stage, 'metrics': metrics,
+            'status': status, 'error': error, 'elapsed': time.perf_counter() - start}
+
+def analyze_folder(folder, extension, stage):
+    logging.info(f"Listando arquivos {extension} na pasta {folder}:")
+    results = [analyze_file(os.path.join(folder, filename), stage)
+               for filename in sorted(os.listdir(folder)) if filename.endswith(extension)]
+
+    # Uma única transação para todas as métricas da pasta
+    get_store().append_many((result['input'], stage, result['metrics']) for result in results if result['status'] == 'ok')
+    return results
 
 def main():
     create_directory_if_not_exists(input_folder)
@@ -60,7 +170,11 @@ def main():
     create_directory_if_not_exists(treated_folder)
     create_directory_if_not_exists(converted_folder)
 
-    processor = AudioProcessor()
+    if trace_file:
+        enable_tracing(trace_file)
+
+    processor = AudioProcessor(bitrate=mp3_bitrate, vbr_quality=mp3_vbr_quality,
+                               loudness_target=loudness_target, true_peak_ceiling=true_peak_ceiling)
 
     while True:
         print("\nEscolha uma opção:")
@@ -75,40 +189,21 @@ def main():
         choice = input("Digite o número da sua escolha: ")
 
         if choice == '1':
-            extract_audio(input_folder, staging_folder)
+            extract_audio(input_folder, staging_folder, extraction_workers, extraction_sample_rate, extraction_channels, extraction_sample_format)
         elif choice == '2':
             treat_audio_concurrently(staging_folder, treated_folder, processor)
         elif choice == '3':
             convert_audio_to_mp3(staging_folder, converted_folder)
         elif choice == '4':
-            analysis_folder = os.path.join(staging_folder, 'analysis')
-            create_directory_if_not_exists(analysis_folder)
-            for filename in os.listdir(staging_folder):
-                if filename.endswith('.wav'):
-                    input_path = os.path.join(staging_folder, filename)
-                    logging.info(f"Analisando o áudio extraído: {input_path}")
-                    save_audio_analysis(input_path, analysis_folder, stage='original')
+            analyze_folder(staging_folder, '.wav', 'original')
         elif choice == '5':
-            treated_analysis_folder = os.path.join(treated_folder, 'analysis')
-            create_directory_if_not_exists(treated_analysis_folder)
-            logging.info("Listando arquivos .mp3 na pasta treated:")
-            for filename in os.listdir(treated_folder):
-                if filename.endswith('.mp3'):
-                    logging.info(f"Encontrado: {filename}")
-                    input_path = os.path.join(treated_folder, filename)
-                    logging.info(f"Analisando o áudio tratado: {input_path}")
-                    save_audio_analysis(input_path, treated_analysis_folder, stage='treated')
+            analyze_folder(treated_folder, '.mp3', 'treated')
         elif choice == '6':
-            converted_analysis_folder = os.path.join(converted_folder, 'analysis')
-            create_directory_if_not_exists(converted_analysis_folder)
-            logging.info("Listando arquivos .mp3 na pasta converted:")
-            for filename in os.listdir(converted_folder):
-                if filename.endswith('.mp3'):
-                    logging.info(f"Encontrado: {filename}")
-                    input_path = os.path.join(converted_folder, filename)
-                    logging.info(f"Analisando o áudio convertido: {input_path}")
-                    save_audio_analysis(input_path, converted_analysis_folder, stage='converted')
+            analyze_folder(converted_folder, '.mp3', 'converted')
         elif choice == '7':
+            if trace_file and os.path.exists(trace_file):
+                chrome_trace = export_chrome_trace(trace_file, os.path.splitext(trace_file)[0] + '.trace.json')
+                logging.info(f"Trace salvo em {trace_file} e {chrome_trace}")
             logging.info("Saindo...")
             break
         else:
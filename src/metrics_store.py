@@ -0,0 +1,128 @@
+import contextlib
+import os
+import sqlite3
+import time
+from analyzer import save_metrics
+
+# Colunas fixas; cada métrica vira uma coluna adicional criada sob demanda
+KEY_COLUMNS = ('file', 'stage', 'metric_set')
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=')
+
+class MetricsStore:
+    """
+    Armazena as métricas em SQLite com uma linha por (arquivo, estágio,
+    conjunto de métricas) e uma coluna por métrica, para consultas filtradas
+    em milhares de arquivos sem ler arquivos de texto.
+
+    :param db_path: Caminho do banco SQLite.
+    """
+
+    def __init__(self, db_path):
+        # Caminho absoluto: o singleton continua válido se o diretório atual mudar
+        self.db_path = os.path.abspath(db_path)
+        folder = os.path.dirname(self.db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS metrics (file TEXT, stage TEXT, metric_set TEXT, '
+                         'updated_at REAL, PRIMARY KEY (file, stage, metric_set))')
+            conn.execute('CREATE INDEX IF NOT EXISTS metrics_stage ON metrics (stage)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _columns(self, conn):
+        return [row[1] for row in conn.execute('PRAGMA table_info(metrics)')]
+
+    def _ensure_columns(self, conn, names):
+        existing = set(self._columns(conn))
+        for name in names:
+            if name not in existing:
+                conn.execute(f'ALTER TABLE metrics ADD COLUMN {_quote(name)} REAL')
+                existing.add(name)
+
+    def append(self, file, stage, metrics, metric_set='analysis'):
+        self.append_many([(file, stage, metrics)], metric_set=metric_set)
+
+    def append_many(self, rows, metric_set='analysis'):
+        # Inserção em lote numa única transação; linhas existentes são substituídas
+        rows = list(rows)
+        if not rows:
+            return
+        names = sorted({name for _, _, metrics in rows for name in metrics})
+        now = time.time()
+        with self._connect() as conn:
+            self._ensure_columns(conn, names)
+            for file, stage, metrics in rows:
+                columns = list(KEY_COLUMNS) + ['updated_at'] + list(metrics)
+                values = [os.path.abspath(file), stage, metric_set, now] + [float(value) for value in metrics.values()]
+                placeholders = ', '.join('?' for _ in columns)
+                conn.execute(f'INSERT OR REPLACE INTO metrics ({", ".join(_quote(c) for c in columns)}) VALUES ({placeholders})', values)
+
+    def query(self, stage=None, metric_set=None, file=None, where=None):
+        """
+        Consulta as métricas armazenadas.
+
+        :param where: Lista de filtros (métrica, operador, valor),
+            ex.: [('Spectral Flatness', '>', 0.3)].
+        :return: Lista de dicionários com file, stage, metric_set e as métricas.
+        """
+        clauses, params = [], []
+        for column, value in (('stage', stage), ('metric_set', metric_set), ('file', file)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(os.path.abspath(value) if column == 'file' else value)
+        with self._connect() as conn:
+            columns = self._columns(conn)
+            for name, operator, value in where or []:
+                if operator not in OPERATORS:
+                    raise ValueError(f"Operador inválido: {operator}")
+                if name not in columns:
+                    return []
+                clauses.append(f'{_quote(name)} {operator} ?')
+                params.append(value)
+            sql = 'SELECT * FROM metrics'
+            if clauses:
+                sql += ' WHERE ' + ' AND '.join(clauses)
+            rows = conn.execute(sql + ' ORDER BY file, stage', params).fetchall()
+
+        results = []
+        for row in rows:
+            record = {column: value for column, value in zip(columns, row) if value is not None}
+            record.pop('updated_at', None)
+            results.append(record)
+        return results
+
+    def get(self, file, stage, metric_set='analysis'):
+        rows = self.query(stage=stage, metric_set=metric_set, file=file)
+        if not rows:
+            return None
+        return {name: value for name, value in rows[0].items() if name not in KEY_COLUMNS}
+
+    def export_txt(self, file, stage, filepath, metric_set='analysis'):
+        # Exporta no formato legado "chave: valor" de save_metrics
+        metrics = self.get(file, stage, metric_set)
+        if metrics is None:
+            return False
+        save_metrics(metrics, filepath)
+        return True
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+_default_store = None
+
+def get_store():
+    # Banco de métricas compartilhado entre main.py e app.py, configurado em config.py
+    global _default_store
+    if _default_store is None:
+        from config import metrics_db
+        _default_store = MetricsStore(metrics_db)
+    return _default_store
@@ -0,0 +1,196 @@
+"""
+Monta o dataset de features usado por train_model.py.
+
+Percorre uma árvore de áudios e calcula as métricas do analisador
+(calculate_metrics, ou stream_audio_features nas gravações longas) em
+processos paralelos. As linhas são gravadas em shards Parquet à medida que
+ficam prontas (as pendentes são gravadas também numa interrupção), e ao
+recomeçar os arquivos que já estão no dataset (mesmo caminho, tamanho, data
+de modificação e analyzer.METRICS_VERSION) são pulados.
+
+O rótulo de cada arquivo é o nome da primeira pasta abaixo da raiz
+(raiz/limpo/a.wav tem rótulo 'limpo'); arquivos direto na raiz ficam sem rótulo.
+
+Exemplos:
+    python src/model/build_dataset.py /dados/acervo --jobs 8
+"""
+import argparse
+import concurrent.futures
+import logging
+import os
+import sys
+import time
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+SRC_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SRC_FOLDER)
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.mp3', '.ogg', '.m4a', '.aac')
+# Linhas por shard: uma queda do processo refaz no máximo esta quantidade de arquivos
+SHARD_ROWS = 500
+# Colunas de identificação; as demais são as métricas do analisador
+KEY_COLUMNS = ('file', 'size', 'mtime_ns', 'metrics_version', 'label', 'error')
+# Chave de retomada: o arquivo inalterado, analisado pela mesma versão das métricas
+RESUME_COLUMNS = ('file', 'size', 'mtime_ns', 'metrics_version')
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def list_audio_files(root):
+    paths = []
+    for folder, _, filenames in os.walk(root):
+        paths.extend(os.path.join(folder, filename) for filename in filenames if filename.lower().endswith(AUDIO_EXTENSIONS))
+    return sorted(paths)
+
+def label_for(path, root):
+    parts = os.path.relpath(path, root).split(os.sep)
+    return parts[0] if len(parts) > 1 else None
+
+def init_worker():
+    # Importa as bibliotecas pesadas uma única vez por processo de trabalho
+    import librosa  # noqa: F401
+
+def extract_features(path, label=None):
+    # Uma linha do dataset; falhas também são gravadas, para não repetir o arquivo a cada retomada
+    import soundfile as sf
+    from analyzer import calculate_metrics, stream_audio_features
+    from config import streaming_min_duration
+    from wavmap import open_audio, load_audio
+    stat = os.stat(path)
+    row = {'file': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'label': label, 'error': None}
+    try:
+        try:
+            with open_audio(path) as f:
+                streaming = f.frames / f.samplerate >= streaming_min_duration
+        except sf.LibsndfileError:
+            # Formato fora do libsndfile (M4A, AAC): só a leitura inteira pelo librosa
+            streaming = False
+        if streaming:
+            _, metrics, _ = stream_audio_features(path)
+        else:
+            y, sr = load_audio(path, mono=False)
+            metrics = calculate_metrics(y, sr)
+        row.update({name: float(value) for name, value in metrics.items()})
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    return row
+
+def shard_paths(output_folder):
+    if not os.path.isdir(output_folder):
+        return []
+    return sorted(os.path.join(output_folder, filename) for filename in os.listdir(output_folder) if filename.endswith('.parquet'))
+
+def existing_keys(output_folder, include_errors=True):
+    # Só as colunas da chave de retomada são lidas dos shards; shards sem a
+    # versão das métricas (anteriores a ela) não contam
+    keys = set()
+    for path in shard_paths(output_folder):
+        if 'metrics_version' not in pq.read_schema(path).names:
+            continue
+        table = pq.read_table(path, columns=list(RESUME_COLUMNS) + ['error'])
+        errors = table.column('error').to_pylist()
+        keys.update(key for key, error in zip(zip(*(table.column(name).to_pylist() for name in RESUME_COLUMNS)), errors)
+                    if include_errors or error is None)
+    return keys
+
+def write_shard(rows, output_folder):
+    # Nome em ordem de gravação: na leitura, a linha mais nova de um arquivo prevalece.
+    # Gravação atômica: um shard pela metade nunca é lido
+    path = os.path.join(output_folder, f'part-{time.time_ns()}-{os.getpid()}.parquet')
+    pq.write_table(pa.Table.from_pylist(rows), path + '.part')
+    os.replace(path + '.part', path)
+    return path
+
+def build_dataset(root, output_folder, jobs=None, shard_rows=SHARD_ROWS, retry_errors=False):
+    """
+    :param retry_errors: Analisa de novo os arquivos que falharam antes; sem
+        ele, um arquivo com erro só é refeito quando muda.
+    :return: Dicionário com o total de arquivos encontrados, pulados (já no
+        dataset), processados e com erro.
+    """
+    from analyzer import METRICS_VERSION
+    os.makedirs(output_folder, exist_ok=True)
+    done = existing_keys(output_folder, include_errors=not retry_errors)
+    paths = list_audio_files(root)
+    pending = []
+    for path in paths:
+        stat = os.stat(path)
+        if (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, METRICS_VERSION) not in done:
+            pending.append(path)
+    summary = {'found': len(paths), 'skipped': len(paths) - len(pending), 'processed': 0, 'errors': 0}
+    logging.info(f"{len(paths)} arquivo(s) encontrado(s), {summary['skipped']} já no dataset")
+
+    start = time.perf_counter()
+    rows = []
+    jobs = jobs or os.cpu_count()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as executor:
+        try:
+            # Poucos arquivos em andamento por vez: a memória não depende do tamanho do acervo
+            queued = iter(pending)
+            futures = set()
+            while True:
+                for path in queued:
+                    futures.add(executor.submit(extract_features, path, label_for(path, root)))
+                    if len(futures) >= jobs * 2:
+                        break
+                if not futures:
+                    break
+                finished, futures = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    row = future.result()
+                    row['metrics_version'] = METRICS_VERSION
+                    rows.append(row)
+                    summary['processed'] += 1
+                    if row['error']:
+                        summary['errors'] += 1
+                        logging.error(f"Erro ao analisar {row['file']}: {row['error']}")
+                if len(rows) >= shard_rows:
+                    write_shard(rows, output_folder)
+                    rows = []
+                    elapsed = time.perf_counter() - start
+                    logging.info(f"{summary['processed']}/{len(pending)} arquivo(s) ({summary['processed'] / elapsed:.1f} arquivos/s)")
+        finally:
+            # Ctrl+C ou BrokenProcessPool: as linhas já calculadas não se perdem
+            if rows:
+                write_shard(rows, output_folder)
+    return summary
+
+def load_dataset(output_folder, columns=None):
+    """
+    Lê os shards direto para um DataFrame (sem CSV), só com as colunas pedidas.
+    Arquivos presentes em mais de um shard (alterados depois da primeira
+    análise) ficam só com a linha mais nova; linhas com erro são descartadas.
+
+    :param columns: Métricas a ler; None lê todas.
+    :return: DataFrame com file, label e as métricas.
+    """
+    paths = shard_paths(output_folder)
+    if not paths:
+        raise FileNotFoundError(f"Nenhum shard do dataset em {output_folder}")
+    # Shards só com erros não têm as colunas das métricas; o esquema unificado cobre todos
+    schema = pa.unify_schemas([pq.read_schema(path) for path in paths])
+    if columns is None:
+        columns = [name for name in schema.names if name not in KEY_COLUMNS]
+    df = ds.dataset(paths, schema=schema, format='parquet').to_table(columns=['file', 'label', 'error'] + list(columns)).to_pandas()
+    df = df.drop_duplicates(subset='file', keep='last')
+    return df[df['error'].isna()].drop(columns='error').reset_index(drop=True)
+
+def main(argv=None):
+    from config import dataset_folder
+    parser = argparse.ArgumentParser(description='Monta o dataset de features do analisador em shards Parquet')
+    parser.add_argument('root', help='pasta com os áudios (subpastas são os rótulos)')
+    parser.add_argument('--output', default=dataset_folder, help='pasta dos shards Parquet (padrão: dataset_folder do config.py)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='número de processos de trabalho')
+    parser.add_argument('--shard-rows', type=int, default=SHARD_ROWS, help='linhas por shard')
+    parser.add_argument('--retry-errors', action='store_true', help='analisa de novo os arquivos que falharam antes')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summary = build_dataset(args.root, args.output, args.jobs, args.shard_rows, args.retry_errors)
+    print(f"Dataset em {args.output} ({time.perf_counter() - start:.1f} s): {summary['processed']} processado(s), "
+          f"{summary['skipped']} pulado(s), {summary['errors']} com erro")
+    return 1 if summary['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
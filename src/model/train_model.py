@@ -1,30 +1,52 @@
+import argparse
+import os
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.model_selection import train_test_split
 import joblib
+from build_dataset import load_dataset
+from config import dataset_folder, parameter_model
 
 # Exemplo de função para treinar o modelo de parâmetros de áudio
-def train_audio_processing_model():
-    # Carregar o dataset (substitua com o caminho correto)
-    df = pd.read_csv('audio_noise_dataset.csv')
-    
-    # Features e rótulo
-    X = df.drop(columns=['label'])
-    y = df['label']
-    
+def train_audio_processing_model(dataset_folder=dataset_folder, model_path=parameter_model):
+    # Carregar os shards Parquet gerados por build_dataset.py
+    df = load_dataset(dataset_folder)
+    df = df[df['label'].notna()]
+
+    # Features e rótulo; silêncio tem loudness -inf e fica de fora
+    X = df.drop(columns=['file', 'label']).replace([np.inf, -np.inf], np.nan).dropna()
+    y = df.loc[X.index, 'label']
+    # Pastas com nomes numéricos (ex.: 0.8, a redução de ruído usada) viram rótulos numéricos
+    numeric_labels = pd.to_numeric(y, errors='coerce')
+    if numeric_labels.notna().all():
+        y = numeric_labels
+
     # Dividir o dataset
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Treinar o modelo
-    model = RandomForestRegressor()  # Ou RandomForestClassifier para classificação
+
+    # Treinar o modelo: rótulos numéricos são regressão; nomes de pasta, classificação
+    numeric = pd.api.types.is_numeric_dtype(y)
+    model = RandomForestRegressor() if numeric else RandomForestClassifier()
     model.fit(X_train, y_train)
-    
+
     # Avaliação do modelo
     accuracy = model.score(X_test, y_test)
-    print(f'Accuracy: {accuracy * 100:.2f}%')
-    
-    # Salvar o modelo
-    joblib.dump(model, 'audio_processing_model.pkl')
+    print(f'{"R²" if numeric else "Accuracy"}: {accuracy * 100:.2f}%')
+
+    # Salvar o modelo (feature_names_in_ guarda a ordem das colunas)
+    folder = os.path.dirname(model_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    joblib.dump(model, model_path)
+    return model
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Treina o modelo de sugestão de parâmetros com o dataset de build_dataset.py')
+    parser.add_argument('--dataset', default=dataset_folder, help='pasta dos shards Parquet (padrão: dataset_folder do config.py)')
+    parser.add_argument('--output', default=parameter_model, help='arquivo do modelo (padrão: parameter_model do config.py)')
+    args = parser.parse_args(argv)
+    train_audio_processing_model(args.dataset, args.output)
 
 if __name__ == '__main__':
-    train_audio_processing_model()
+    main()
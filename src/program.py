@@ -0,0 +1,125 @@
+import collections
+import os
+import threading
+import numpy as np
+from extractor import decode_audio
+from encoder import encode_to_bytes
+from instrumentation import span
+
+# Formato comum do programa: cada áudio é convertido para ele ao ser decodificado
+PROGRAM_SAMPLE_RATE = 44100
+PROGRAM_CHANNELS = 2
+# Limite de memória dos áudios decodificados mantidos em cache
+MAX_CACHED_BYTES = 512 * 1024 * 1024
+
+def _segment_key(path):
+    # O mesmo arquivo alterado no disco gera outra chave
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+def _fades(length):
+    # Crossfade de potência constante: o volume não cai no meio da transição
+    t = np.linspace(0.0, np.pi / 2, length, dtype=np.float32)[:, None]
+    return np.cos(t), np.sin(t)
+
+class ProgramAssembler:
+    """
+    Monta um programa (sequência de áudios, com crossfade opcional) em tempo
+    linear: cada arquivo é decodificado uma única vez e mantido em cache, e o
+    resultado é escrito num buffer pré-alocado com o tamanho final.
+
+    Entre duas montagens, o trecho inicial que não mudou (mesmos arquivos, na
+    mesma ordem, e mesmo crossfade) é copiado da montagem anterior; só a
+    partir do primeiro item alterado a mixagem é refeita.
+
+    :param sample_rate: Taxa do programa; os arquivos são reamostrados para ela.
+    :param channels: Canais do programa.
+    :param max_cached_bytes: Limite dos áudios decodificados em cache (LRU).
+    """
+
+    def __init__(self, sample_rate=PROGRAM_SAMPLE_RATE, channels=PROGRAM_CHANNELS, max_cached_bytes=MAX_CACHED_BYTES):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.max_cached_bytes = max_cached_bytes
+        self._segments = collections.OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        # Última montagem: chaves dos itens, crossfade e o buffer (somente leitura)
+        self._last_keys = []
+        self._last_crossfade = None
+        self._last_buffer = None
+
+    def segment(self, path):
+        key = _segment_key(path)
+        with self._lock:
+            if key in self._segments:
+                self._segments.move_to_end(key)
+                return self._segments[key]
+        with span('program_decode', file=path):
+            y, _ = decode_audio(path, sample_rate=self.sample_rate, channels=self.channels)
+        y = y.reshape(-1, self.channels)
+        y.setflags(write=False)
+        with self._lock:
+            self._segments[key] = y
+            self._cached_bytes += y.nbytes
+            while self._cached_bytes > self.max_cached_bytes and len(self._segments) > 1:
+                _, evicted = self._segments.popitem(last=False)
+                self._cached_bytes -= evicted.nbytes
+        return y
+
+    def _layout(self, segments, crossfade):
+        # Início de cada item; o crossfade de cada junção é limitado à metade do
+        # item mais curto, para que uma transição nunca encoste na seguinte
+        offsets, fades = [0], [0]
+        for previous, current in zip(segments, segments[1:]):
+            fade = min(crossfade, len(previous) // 2, len(current) // 2)
+            offsets.append(offsets[-1] + len(previous) - fade)
+            fades.append(fade)
+        return offsets, fades
+
+    def assemble(self, paths, crossfade=0.0):
+        """
+        :param paths: Arquivos na ordem do programa.
+        :param crossfade: Duração de cada transição, em segundos.
+        :return: Array float32 (amostras, canais).
+        """
+        crossfade = int(crossfade * self.sample_rate)
+        keys = [_segment_key(path) for path in paths]
+        segments = [self.segment(path) for path in paths]
+        if not segments:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        offsets, fades = self._layout(segments, crossfade)
+        total = offsets[-1] + len(segments[-1])
+
+        with span('program_assemble', items=len(segments), crossfade=crossfade) as current:
+            with self._lock:
+                reused = 0
+                if self._last_crossfade == crossfade and self._last_buffer is not None:
+                    while reused < min(len(keys), len(self._last_keys)) and keys[reused] == self._last_keys[reused]:
+                        reused += 1
+                # A transição para o primeiro item alterado depende do tamanho dele, então
+                # a mixagem recomeça no item anterior; antes do início deste, nada mudou
+                first = max(min(reused, len(keys) - 1) - 1, 0)
+                buffer = np.empty((total, self.channels), dtype=np.float32)
+                if first > 0:
+                    buffer[:offsets[first]] = self._last_buffer[:offsets[first]]
+                current.set(reused_items=first)
+
+                for i in range(first, len(segments)):
+                    start, segment, fade = offsets[i], segments[i], fades[i]
+                    if fade:
+                        # O final do item anterior ocupa a região da transição
+                        previous = segments[i - 1]
+                        fade_out, fade_in = _fades(fade)
+                        buffer[start:start + fade] = previous[len(previous) - fade:] * fade_out + segment[:fade] * fade_in
+                    buffer[start + fade:start + len(segment)] = segment[fade:]
+
+                buffer.setflags(write=False)
+                self._last_keys, self._last_crossfade, self._last_buffer = keys, crossfade, buffer
+        return buffer
+
+    def render(self, paths, output_format='mp3', crossfade=0.0, bitrate=None, vbr_quality=None):
+        # Programa codificado em memória, pronto para st.audio/st.download_button
+        y = self.assemble(paths, crossfade)
+        with span('program_encode', format=output_format):
+            return encode_to_bytes(y, self.sample_rate, output_format, bitrate=bitrate, vbr_quality=vbr_quality)
@@ -0,0 +1,99 @@
+import functools
+import threading
+import numpy as np
+import librosa
+
+# O matplotlib (meio segundo de importação) só é carregado ao gerar a primeira imagem
+
+# Faixa dinâmica exibida abaixo do pico (dB), a mesma do amplitude_to_db do librosa
+TOP_DB = 80.0
+# Frequências marcadas no eixo vertical do modo com legenda
+FREQUENCY_TICKS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+@functools.lru_cache(maxsize=None)
+def colormap_lut(cmap='magma'):
+    # Tabela de 256 cores RGB (uint8) indexada pelo valor quantizado em dB
+    import matplotlib
+    colors = matplotlib.colormaps[cmap](np.linspace(0.0, 1.0, 256))[:, :3]
+    return np.round(colors * 255).astype(np.uint8)
+
+def _pool(S, edges, axis):
+    # Máximo por faixa: picos estreitos continuam visíveis depois da redução
+    return np.maximum.reduceat(S, edges[:-1], axis=axis)
+
+def downsample(S, width=None, height=None):
+    """
+    Reduz o espectrograma de magnitude para no máximo width colunas (tempo) e
+    height linhas (frequência), com as linhas em escala logarítmica de
+    frequência, como o eixo y='log' do specshow. A linha 0 é a frequência
+    mais baixa.
+    """
+    n_bins, n_frames = S.shape
+    if width is not None and n_frames > width:
+        S = _pool(S, np.linspace(0, n_frames, width + 1).astype(int), axis=1)
+    rows = n_bins if height is None else height
+    # O bin 0 (DC) fica de fora da escala log, como no specshow
+    edges = np.geomspace(1, n_bins, rows + 1).astype(int)
+    return _pool(S, edges, axis=0)
+
+def to_db(S, top_db=TOP_DB):
+    return librosa.amplitude_to_db(S, ref=np.max, top_db=top_db)
+
+def render_spectrogram(S, filepath, width=None, height=None, cmap='magma', top_db=TOP_DB):
+    """
+    Grava o espectrograma direto como imagem, sem figura do matplotlib: os
+    valores em dB passam por uma tabela de cores e o array RGB vai para o PNG.
+
+    :param S: Espectrograma de magnitude (bins x quadros).
+    :param width: Largura máxima em pixels; None mantém um pixel por quadro.
+    :param height: Altura em pixels; None mantém um pixel por bin.
+    """
+    from matplotlib.image import imsave
+    D = to_db(downsample(S, width, height), top_db)
+    index = np.clip((D + top_db) * (255.0 / top_db), 0, 255).astype(np.uint8)
+    rgb = colormap_lut(cmap)[index[::-1]]
+    imsave(filepath, rgb)
+
+class FigureRenderer:
+    """
+    Espectrograma com eixos, título e barra de cores, reaproveitando uma única
+    figura: a cada arquivo só os dados da imagem, a extensão e os rótulos
+    mudam. Usa a API orientada a objetos (sem pyplot) e não é compartilhada
+    entre threads; veja figure_renderer().
+    """
+
+    def __init__(self, figsize=(10, 4), cmap='magma', top_db=TOP_DB):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        self.top_db = top_db
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.image = self.axes.imshow(np.zeros((2, 2)), cmap=cmap, vmin=-top_db, vmax=0,
+                                      origin='lower', aspect='auto', interpolation='nearest')
+        self.figure.colorbar(self.image, ax=self.axes, format='%+2.0f dB')
+        self.axes.set_xlabel('Time (s)')
+        self.axes.set_ylabel('Hz')
+        self.figure.tight_layout()
+
+    def render(self, S, sr, filepath, hop_length=512, width=None, height=None, title='Spectrogram'):
+        n_bins, n_frames = S.shape
+        rows = n_bins if height is None else height
+        self.image.set_data(to_db(downsample(S, width, height), self.top_db))
+        self.image.set_extent((0, n_frames * hop_length / sr, 0, rows))
+
+        # Posição de cada frequência na escala log usada por downsample
+        n_fft = 2 * (n_bins - 1)
+        ticks = [f for f in FREQUENCY_TICKS if 1 <= f * n_fft / sr < n_bins]
+        self.axes.set_yticks([np.log(f * n_fft / sr) / np.log(n_bins) * rows for f in ticks], [str(f) for f in ticks])
+        self.axes.set_title(title)
+        self.figure.savefig(filepath)
+
+_local = threading.local()
+
+def figure_renderer():
+    # Uma figura por thread, criada no primeiro uso
+    renderer = getattr(_local, 'renderer', None)
+    if renderer is None:
+        renderer = _local.renderer = FigureRenderer()
+    return renderer
@@ -0,0 +1,107 @@
+import logging
+import math
+import os
+import threading
+from instrumentation import span
+
+# Limites das sugestões, os mesmos dos controles da interface
+NOISE_REDUCTION_RANGE = (0.0, 1.0)
+LOW_CUTOFF_RANGE = (20, 500)
+HIGH_CUTOFF_RANGE = (5000, 16000)
+
+def heuristic_parameters(metrics):
+    # Fórmulas usadas antes do modelo; continuam valendo sem ele
+    noise_reduction_prop = 0.5 + (metrics.get('Zero Crossing Rate', 0) * 0.5)
+    low_cutoff = max(20, int(metrics.get('Spectral Centroid', 100)))
+    high_cutoff = min(16000, int(metrics.get('Spectral Bandwidth', 8000)))
+    return noise_reduction_prop, low_cutoff, high_cutoff
+
+def _clip(value, limits):
+    return min(max(value, limits[0]), limits[1])
+
+class ParameterSuggester:
+    """
+    Sugere os parâmetros de tratamento (redução de ruído, cortes baixo e alto)
+    com o modelo salvo por model/train_model.py. O modelo é carregado uma vez
+    por processo e mantido em memória; só é lido de novo se o arquivo mudar
+    (novo treino). Sem modelo, ou quando faltam métricas que ele usa, vale a
+    heurística anterior.
+
+    Um modelo de uma saída prevê a proporção de redução de ruído e os cortes
+    vêm da heurística; um modelo de três saídas prevê os três parâmetros.
+    Modelos de classificação (rótulos não numéricos) não dão parâmetros e são
+    ignorados.
+
+    :param model_path: Caminho do .pkl do joblib.
+    """
+
+    def __init__(self, model_path):
+        self.model_path = os.path.abspath(model_path)
+        self._model = None
+        self._model_mtime = None
+        self._lock = threading.Lock()
+
+    def model(self):
+        # O stat custa microssegundos; o joblib.load, centenas de milissegundos
+        try:
+            mtime = os.stat(self.model_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._model_mtime:
+                import joblib
+                from sklearn.base import is_regressor
+                with span('model_load', file=self.model_path):
+                    model = joblib.load(self.model_path)
+                if not hasattr(model, 'feature_names_in_') or not is_regressor(model):
+                    logging.warning(f"Modelo {self.model_path} não é um regressor treinado por train_model.py; usando a heurística")
+                    model = None
+                self._model, self._model_mtime = model, mtime
+            return self._model
+
+    def warm(self):
+        # Carrega o modelo antes da primeira sugestão (ex.: ao abrir a interface)
+        return self.model() is not None
+
+    def suggest(self, metrics):
+        return self.suggest_many([metrics])[0]
+
+    def suggest_many(self, metrics_list):
+        """
+        Sugestões para vários arquivos com uma única chamada ao modelo.
+
+        :param metrics_list: Lista de dicionários de métricas do analisador.
+        :return: Lista de tuplas (noise_reduction_prop, low_cutoff, high_cutoff).
+        """
+        metrics_list = list(metrics_list)
+        suggestions = [heuristic_parameters(metrics) for metrics in metrics_list]
+        with span('parameter_inference', files=len(metrics_list)) as current:
+            model = self.model()
+            features = list(model.feature_names_in_) if model is not None else []
+            # Arquivos sem alguma métrica do modelo (ou com loudness -inf, silêncio) ficam com a heurística
+            rows = [i for i, metrics in enumerate(metrics_list)
+                    if features and all(name in metrics and math.isfinite(metrics[name]) for name in features)]
+            current.set(source='model' if rows else 'heuristic', model_files=len(rows))
+            if rows:
+                import numpy as np
+                import pandas as pd
+                X = pd.DataFrame([[metrics_list[i][name] for name in features] for i in rows], columns=features)
+                predictions = np.asarray(model.predict(X)).reshape(len(rows), -1)
+                for i, prediction in zip(rows, predictions):
+                    noise_reduction_prop, low_cutoff, high_cutoff = suggestions[i]
+                    noise_reduction_prop = _clip(float(prediction[0]), NOISE_REDUCTION_RANGE)
+                    if len(prediction) >= 3:
+                        low_cutoff = int(_clip(prediction[1], LOW_CUTOFF_RANGE))
+                        high_cutoff = int(_clip(prediction[2], HIGH_CUTOFF_RANGE))
+                    suggestions[i] = (noise_reduction_prop, low_cutoff, high_cutoff)
+        return suggestions
+
+_default_suggester = None
+
+def get_suggester():
+    # Modelo compartilhado por todas as sessões da interface, configurado em config.py
+    global _default_suggester
+    if _default_suggester is None:
+        from config import parameter_model
+        _default_suggester = ParameterSuggester(parameter_model)
+    return _default_suggester
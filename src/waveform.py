@@ -0,0 +1,162 @@
+import os
+import numpy as np
+import soundfile as sf
+from extractor import DecodeStream, is_up_to_date
+
+# Amostras por coluna no nível mais fino; cada nível seguinte agrupa FACTOR colunas
+SAMPLES_PER_BIN = 256
+FACTOR = 2
+# O último nível tem no máximo esta quantidade de colunas
+MIN_LEVEL_BINS = 1024
+# Amostras lidas por vez ao construir a pirâmide (múltiplo de SAMPLES_PER_BIN)
+BUILD_BLOCKSIZE = SAMPLES_PER_BIN * 4096
+# Picos gravados em 16 bits, como os arquivos .dat do audiowaveform
+PEAK_SCALE = 32767
+
+def _iter_mono_blocks(input_path, blocksize):
+    # Formatos do libsndfile (WAV, FLAC, OGG, MP3...) são lidos direto; os demais via ffmpeg
+    try:
+        info = sf.info(input_path)
+    except sf.LibsndfileError:
+        info = None
+    if info is not None:
+        yield info.samplerate
+        for block in sf.blocks(input_path, blocksize=blocksize, dtype='float32', always_2d=True):
+            yield block.mean(axis=1)
+    else:
+        with DecodeStream(input_path, channels=1, blocksize=blocksize) as stream:
+            yield stream.sample_rate
+            yield from stream
+
+def _reduce_level(mins, maxs):
+    # Agrupa FACTOR colunas vizinhas; a última coluna incompleta é mantida
+    edges = np.arange(0, len(mins), FACTOR)
+    return np.minimum.reduceat(mins, edges), np.maximum.reduceat(maxs, edges)
+
+class WaveformPeaks:
+    """
+    Pirâmide de picos (mínimo e máximo por coluna) em várias resoluções,
+    para desenhar qualquer trecho da forma de onda a partir de poucos
+    milhares de pontos, em tempo proporcional à largura e não à duração.
+
+    O nível 0 tem uma coluna a cada SAMPLES_PER_BIN amostras; o nível k, a
+    cada SAMPLES_PER_BIN * FACTOR**k.
+    """
+
+    def __init__(self, sr, frames, levels, samples_per_bin=SAMPLES_PER_BIN):
+        self.sr = sr
+        self.frames = frames
+        self.levels = levels  # lista de pares (mínimos, máximos) em int16
+        self.samples_per_bin = samples_per_bin
+
+    @property
+    def duration(self):
+        return self.frames / self.sr
+
+    @property
+    def nbytes(self):
+        return sum(mins.nbytes + maxs.nbytes for mins, maxs in self.levels)
+
+    @classmethod
+    def build(cls, input_path, samples_per_bin=SAMPLES_PER_BIN, blocksize=BUILD_BLOCKSIZE):
+        # Leitura em blocos: só o nível 0 (duas colunas a cada samples_per_bin amostras) fica em memória
+        blocks = _iter_mono_blocks(input_path, blocksize)
+        sr = next(blocks)
+        mins, maxs = [], []
+        frames = 0
+        pending = np.zeros(0, dtype=np.float32)
+        for block in blocks:
+            frames += len(block)
+            data = np.concatenate([pending, block]) if len(pending) else block
+            usable = len(data) - len(data) % samples_per_bin
+            if usable:
+                bins = data[:usable].reshape(-1, samples_per_bin)
+                mins.append(bins.min(axis=1))
+                maxs.append(bins.max(axis=1))
+            pending = data[usable:]
+        if len(pending):
+            mins.append(pending.min(keepdims=True))
+            maxs.append(pending.max(keepdims=True))
+
+        level_mins = _quantize(np.concatenate(mins)) if mins else np.zeros(0, dtype=np.int16)
+        level_maxs = _quantize(np.concatenate(maxs)) if maxs else np.zeros(0, dtype=np.int16)
+        levels = [(level_mins, level_maxs)]
+        while len(levels[-1][0]) > MIN_LEVEL_BINS:
+            levels.append(_reduce_level(*levels[-1]))
+        return cls(sr, frames, levels, samples_per_bin)
+
+    def save(self, path):
+        arrays = {'meta': np.array([self.sr, self.frames, self.samples_per_bin, FACTOR], dtype=np.int64)}
+        for k, (mins, maxs) in enumerate(self.levels):
+            arrays[f'min_{k}'] = mins
+            arrays[f'max_{k}'] = maxs
+        # Gravação atômica: uma pirâmide pela metade nunca é lida
+        partial_path = path + '.part'
+        with open(partial_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(partial_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            sr, frames, samples_per_bin, factor = (int(value) for value in data['meta'])
+            if factor != FACTOR:
+                raise ValueError(f"Pirâmide com fator {factor}, esperado {FACTOR}")
+            levels = []
+            while f'min_{len(levels)}' in data.files:
+                levels.append((data[f'min_{len(levels)}'], data[f'max_{len(levels)}']))
+        return cls(sr, frames, levels, samples_per_bin)
+
+    def window(self, start, end, width):
+        """
+        Picos do trecho [start, end) em segundos, com no máximo width colunas.
+
+        :return: (tempos, mínimos, máximos) em float, com os tempos no início
+            de cada coluna; None se o trecho for curto demais para o nível 0
+            (menos de SAMPLES_PER_BIN amostras por coluna), caso em que as
+            amostras devem ser desenhadas diretamente.
+        """
+        first = max(0, int(start * self.sr))
+        last = min(self.frames, int(end * self.sr))
+        if last <= first or (last - first) / width < self.samples_per_bin:
+            return None
+
+        # Nível mais grosso que ainda tem pelo menos uma coluna por pixel
+        k = min(int(np.log((last - first) / width / self.samples_per_bin) / np.log(FACTOR)), len(self.levels) - 1)
+        bin_size = self.samples_per_bin * FACTOR ** k
+        mins, maxs = self.levels[k]
+        first_bin, last_bin = first // bin_size, -(-last // bin_size)
+        mins, maxs = mins[first_bin:last_bin], maxs[first_bin:last_bin]
+
+        edges = np.arange(len(mins))
+        if len(mins) > width:
+            edges = np.linspace(0, len(mins), width + 1).astype(int)[:-1]
+            mins, maxs = np.minimum.reduceat(mins, edges), np.maximum.reduceat(maxs, edges)
+        times = (first_bin + edges) * bin_size / self.sr
+        return times, mins / PEAK_SCALE, maxs / PEAK_SCALE
+
+def sample_envelope(y, sr, start, width):
+    # Mesmo formato de WaveformPeaks.window para trechos curtos lidos direto do áudio
+    if len(y) <= width:
+        times = start + np.arange(len(y)) / sr
+        return times, y, y
+    edges = np.linspace(0, len(y), width + 1).astype(int)[:-1]
+    return start + edges / sr, np.minimum.reduceat(y, edges), np.maximum.reduceat(y, edges)
+
+def _quantize(values):
+    return np.round(np.clip(values, -1.0, 1.0) * PEAK_SCALE).astype(np.int16)
+
+def peaks_path(audio_path):
+    return audio_path + '.peaks.npz'
+
+def load_peaks(audio_path, path=None):
+    # Reaproveita a pirâmide gravada ao lado do áudio se ela for mais nova que ele
+    path = path or peaks_path(audio_path)
+    if is_up_to_date(audio_path, path):
+        try:
+            return WaveformPeaks.load(path)
+        except (OSError, ValueError, KeyError):
+            pass  # Arquivo corrompido ou de outra versão; é reconstruído
+    peaks = WaveformPeaks.build(audio_path)
+    peaks.save(path)
+    return peaks
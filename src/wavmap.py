@@ -0,0 +1,180 @@
+import os
+import struct
+import numpy as np
+import soundfile as sf
+
+# Códigos de formato do chunk fmt
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Tipo de armazenamento e fator de conversão para float de cada (formato, bits),
+# os mesmos do libsndfile; 24 bits não tem tipo NumPy: é lido como bytes e
+# montado nos 3 bytes altos de um int32, como no libsndfile
+SAMPLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 8): (np.uint8, 1 / 128),
+    (WAVE_FORMAT_PCM, 16): (np.dtype('<i2'), 1 / 32768),
+    (WAVE_FORMAT_PCM, 24): (np.uint8, 1 / 2147483648),
+    (WAVE_FORMAT_PCM, 32): (np.dtype('<i4'), 1 / 2147483648),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): (np.dtype('<f4'), None),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): (np.dtype('<f8'), None),
+}
+# Quadros convertidos por vez ao ler o arquivo inteiro
+READ_BLOCKSIZE = 1 << 18
+
+def _parse_header(path):
+    # (formato, bits, canais, taxa, início e tamanho do chunk data), ou None se
+    # o arquivo não for um WAV/RF64 sem compressão
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] not in (b'RIFF', b'RF64') or riff[8:12] != b'WAVE':
+            return None
+        fmt, ds64_size = None, None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            chunk_id, size = header[:4], struct.unpack('<I', header[4:])[0]
+            if chunk_id == b'data':
+                if fmt is None:
+                    return None
+                offset = f.tell()
+                if size == 0xFFFFFFFF and ds64_size is not None:
+                    size = ds64_size
+                # 0xFFFFFFFF de uma gravação em pipe, ou arquivo cortado: vale o que existe no disco
+                size = min(size, os.fstat(f.fileno()).st_size - offset)
+                return fmt + (offset, size)
+            if chunk_id in (b'fmt ', b'ds64'):
+                body = f.read(size)
+                f.seek(size % 2, 1)
+                if chunk_id == b'ds64':
+                    ds64_size = struct.unpack_from('<Q', body, 8)[0]
+                    continue
+                tag, channels, sr, _, _, bits = struct.unpack_from('<HHIIHH', body)
+                if tag == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                    tag = struct.unpack_from('<H', body, 24)[0]
+                fmt = (tag, bits, channels, sr)
+            else:
+                f.seek(size + size % 2, 1)
+
+class MappedWav:
+    """
+    WAV PCM ou float lido por mapeamento de memória do chunk data: nada é
+    copiado ao abrir, as páginas vêm do cache do sistema (compartilhado entre
+    processos que leem o mesmo arquivo) e a conversão para float é feita só
+    nos quadros pedidos.
+
+    Implementa a parte da interface do soundfile.SoundFile usada no projeto
+    (frames, samplerate, channels, seek, read, blocks), então pode substituí-lo
+    diretamente; view e channel devolvem as amostras sem conversão.
+    """
+
+    def __init__(self, path, header=None):
+        header = header or _parse_header(path)
+        if header is None or (header[0], header[1]) not in SAMPLE_FORMATS:
+            raise ValueError(f"Não é um WAV PCM ou float: {path}")
+        tag, bits, channels, sr, offset, size = header
+        self.name = path
+        self.samplerate = sr
+        self.channels = channels
+        self.bits = bits
+        self.storage, self.scale = SAMPLE_FORMATS[(tag, bits)]
+        width = bits // 8
+        self.frames = size // (width * channels)
+        shape = (self.frames, channels, width) if bits == 24 else (self.frames, channels)
+        if self.frames:
+            self._data = np.memmap(path, dtype=self.storage, mode='r', offset=offset, shape=shape)
+        else:
+            self._data = np.zeros(shape, dtype=self.storage)
+        self._position = 0
+
+    @property
+    def duration(self):
+        return self.frames / self.samplerate
+
+    def view(self, start=0, stop=None):
+        # Amostras (quadros, canais) no tipo gravado, sem cópia; em 24 bits, (quadros, canais, 3) bytes
+        return self._data[start:stop]
+
+    def channel(self, index, start=0, stop=None):
+        return self._data[start:stop, index]
+
+    def convert(self, raw, dtype='float32'):
+        # Mesma escala do libsndfile: inteiros divididos por 2**(bits - 1)
+        if self.bits == 24:
+            padded = np.zeros(raw.shape[:-1] + (4,), dtype=np.uint8)
+            padded[..., 1:] = raw
+            raw = padded.view('<i4')[..., 0]
+        elif self.bits == 8:
+            raw = raw.astype(np.int16) - 128
+        if self.scale is None:
+            return np.asarray(raw, dtype=dtype)
+        return np.multiply(raw, np.asarray(self.scale, dtype=dtype), dtype=dtype)
+
+    def seek(self, frames):
+        self._position = min(max(frames, 0), self.frames)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def read(self, frames=-1, dtype='float64', always_2d=False):
+        stop = self.frames if frames < 0 else min(self.frames, self._position + frames)
+        data = self.convert(self._data[self._position:stop], dtype)
+        self._position = stop
+        return data if always_2d or self.channels > 1 else data[:, 0]
+
+    def blocks(self, blocksize, dtype='float64', always_2d=False):
+        while self._position < self.frames:
+            yield self.read(blocksize, dtype, always_2d)
+
+    def close(self):
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_audio(path):
+    # MappedWav para WAV sem compressão; qualquer outro formato do libsndfile abre com o soundfile
+    header = _parse_header(path)
+    if header is not None and (header[0], header[1]) in SAMPLE_FORMATS:
+        return MappedWav(path, header)
+    return sf.SoundFile(path)
+
+def load_audio(path, mono=True):
+    """
+    Substituto de librosa.load(path, sr=None) que lê WAVs sem compressão pelo
+    mapeamento de memória, convertendo bloco a bloco direto para o array de
+    saída (sem uma cópia intermediária com todos os canais para o mono).
+    Outros formatos (MP3, AAC...) continuam decodificados pelo librosa.
+
+    :return: (y, sr) com y em float32, 1-D em mono ou (canais, amostras).
+    """
+    header = _parse_header(path)
+    if header is None or (header[0], header[1]) not in SAMPLE_FORMATS:
+        import librosa
+        return librosa.load(path, sr=None, mono=mono)
+
+    with MappedWav(path, header) as f:
+        if mono and f.channels > 1:
+            y = np.empty(f.frames, dtype=np.float32)
+        else:
+            y = np.empty((f.channels, f.frames), dtype=np.float32)
+        for start in range(0, f.frames, READ_BLOCKSIZE):
+            raw = f.view(start, start + READ_BLOCKSIZE)
+            if y.ndim == 1:
+                # Média dos canais somados na mesma ordem de librosa.to_mono,
+                # um canal por vez, sem o bloco intermediário (quadros, canais)
+                out = y[start:start + len(raw)]
+                out[:] = f.convert(raw[:, 0])
+                for c in range(1, f.channels):
+                    out += f.convert(raw[:, c])
+                out /= f.channels
+            else:
+                for c in range(f.channels):
+                    y[c, start:start + len(raw)] = f.convert(raw[:, c])
+        sr = f.samplerate
+    # Arquivos mono saem em 1-D mesmo com mono=False, como no librosa
+    return (y[0] if y.ndim == 2 and y.shape[0] == 1 else y), sr
@@ -5,7 +5,7 @@ import librosa
 import soundfile as sf
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
-from analyzer import calculate_metrics, save_audio_analysis
+from analyzer import calculate_metrics, save_audio_analysis, stream_audio_features
 
 def test_calculate_metrics():
     y = np.array([0.1, -0.1, 0.2, -0.2])  # Example waveform
@@ -17,6 +17,8 @@ def test_calculate_metrics():
     assert 'Spectral Bandwidth' in metrics
     assert 'Spectral Flatness' in metrics
     assert 'Spectral Roll-off' in metrics
+    assert 'Integrated Loudness' in metrics
+    assert 'True Peak' in metrics
 
 def test_save_audio_analysis(tmp_path):
     audio_path = tmp_path / "test_audio.wav"
@@ -29,3 +31,36 @@ def test_save_audio_analysis(tmp_path):
     save_audio_analysis(audio_path, output_folder, stage='original')
     assert (output_folder / "test_audio_original_metrics.txt").exists()
     assert (output_folder / "test_audio_original_spectrogram.png").exists()
+
+def test_calculate_metrics_shared_spectrogram():
+    sr = 22050
+    y = np.random.randn(sr).astype(np.float32)
+    metrics = calculate_metrics(y, sr)
+    assert np.isclose(metrics['Spectral Centroid'], np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)))
+    assert np.isclose(metrics['Spectral Bandwidth'], np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr)))
+    assert np.isclose(metrics['Spectral Flatness'], np.mean(librosa.feature.spectral_flatness(y=y)))
+    assert np.isclose(metrics['Spectral Roll-off'], np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr)))
+
+def test_stream_audio_features_matches_in_memory(tmp_path):
+    audio_path = tmp_path / "test_audio.wav"
+    sr = 22050
+    y = np.random.randn(sr * 5, 2).astype(np.float32) * 0.3
+    sf.write(audio_path, y, sr)
+    y_channels, _ = librosa.load(audio_path, sr=None, mono=False)
+    expected = calculate_metrics(y_channels, sr)
+    stream_sr, metrics, S = stream_audio_features(audio_path, block_length=16)
+    assert stream_sr == sr
+    assert metrics.keys() == expected.keys()
+    for key in expected:
+        assert np.isclose(metrics[key], expected[key], rtol=1e-4)
+
+def test_save_audio_analysis_streaming(tmp_path):
+    audio_path = tmp_path / "test_audio.wav"
+    output_folder = tmp_path / "analysis"
+    output_folder.mkdir()
+    sr = 22050
+    y = np.random.randn(sr * 3).astype(np.float32)
+    sf.write(audio_path, y, sr)
+    save_audio_analysis(audio_path, output_folder, stage='original', streaming=True)
+    assert (output_folder / "test_audio_original_metrics.txt").exists()
+    assert (output_folder / "test_audio_original_spectrogram.png").exists()
@@ -0,0 +1,87 @@
+import sys
+import os
+import numpy as np
+import pytest
+import soundfile as sf
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src/model')))
+
+from build_dataset import build_dataset, load_dataset, shard_paths
+from train_model import train_audio_processing_model
+
+def create_tree(root, count):
+    sr = 8000
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        label = 'ruidoso' if i % 2 else 'limpo'
+        (root / label).mkdir(parents=True, exist_ok=True)
+        t = np.arange(sr // 2) / sr
+        y = 0.3 * np.sin(2 * np.pi * (200 + 20 * i) * t) + (0.2 if i % 2 else 0.01) * rng.standard_normal(len(t))
+        sf.write(root / label / f"audio_{i}.wav", y.astype(np.float32), sr)
+
+def test_build_dataset_resumes_and_trains(tmp_path):
+    root, output = tmp_path / "acervo", str(tmp_path / "dataset")
+    create_tree(root, 10)
+    (root / "limpo" / "broken.wav").write_bytes(b"not a wav file")
+
+    summary = build_dataset(str(root), output, jobs=2, shard_rows=4)
+    assert summary == {'found': 11, 'skipped': 0, 'processed': 11, 'errors': 1}
+    assert len(shard_paths(output)) == 3
+
+    # Retomada: só o arquivo alterado é recalculado, e a linha nova substitui a antiga
+    sf.write(root / "limpo" / "audio_0.wav", np.zeros(4000, dtype=np.float32) + 0.1, 8000)
+    summary = build_dataset(str(root), output, jobs=1)
+    assert summary['skipped'] == 10 and summary['processed'] == 1
+
+    df = load_dataset(output)
+    assert len(df) == 10 and set(df['label']) == {'limpo', 'ruidoso'}
+    assert df.loc[df['file'].str.endswith('audio_0.wav'), 'RMS Desvio'].iloc[0] == pytest.approx(0.1, abs=1e-3)
+
+    # A pasta do modelo ainda não existe (como ./audio antes da primeira execução)
+    model = train_audio_processing_model(output, str(tmp_path / "audio" / "model.pkl"))
+    assert 'Spectral Flatness' in model.feature_names_in_
+    assert os.path.exists(tmp_path / "audio" / "model.pkl")
+
+def test_build_dataset_flushes_on_interrupt_and_tracks_metrics_version(tmp_path, monkeypatch):
+    import concurrent.futures
+    import analyzer
+    root, output = tmp_path / "acervo", str(tmp_path / "dataset")
+    create_tree(root, 4)
+
+    # Ctrl+C depois do primeiro arquivo: a linha pronta é gravada mesmo sem completar um shard
+    wait = concurrent.futures.wait
+    calls = []
+    def interrupted_wait(*args, **kwargs):
+        calls.append(1)
+        if len(calls) > 1:
+            raise KeyboardInterrupt
+        return wait(*args, **kwargs)
+    monkeypatch.setattr(concurrent.futures, 'wait', interrupted_wait)
+    with pytest.raises(KeyboardInterrupt):
+        build_dataset(str(root), output, jobs=1, shard_rows=100)
+    monkeypatch.setattr(concurrent.futures, 'wait', wait)
+    saved = len(load_dataset(output))
+    assert saved >= 1
+
+    assert build_dataset(str(root), output, jobs=1)['skipped'] == saved
+    # Nova versão das métricas: tudo é recalculado
+    monkeypatch.setattr(analyzer, 'METRICS_VERSION', analyzer.METRICS_VERSION + 1)
+    assert build_dataset(str(root), output, jobs=1)['processed'] == 4
+
+def test_build_dataset_reads_formats_outside_libsndfile(tmp_path):
+    import subprocess
+    root, output = tmp_path / "acervo", str(tmp_path / "dataset")
+    create_tree(root, 2)
+    # M4A (AAC): o soundfile não abre, o librosa decodifica pelo ffmpeg
+    wav = root / "limpo" / "audio_0.wav"
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', str(wav), str(root / "limpo" / "audio_m4a.m4a")], check=True)
+
+    summary = build_dataset(str(root), output, jobs=1)
+    assert summary['found'] == 3 and summary['errors'] == 0
+    df = load_dataset(output)
+    assert df['file'].str.endswith('audio_m4a.m4a').any()
+
+    # Arquivos com erro só voltam a ser analisados quando pedido
+    (root / "limpo" / "broken.wav").write_bytes(b"not a wav file")
+    assert build_dataset(str(root), output, jobs=1)['errors'] == 1
+    assert build_dataset(str(root), output, jobs=1)['processed'] == 0
+    assert build_dataset(str(root), output, jobs=1, retry_errors=True)['processed'] == 1
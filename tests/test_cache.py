@@ -0,0 +1,78 @@
+import sys
+import os
+import numpy as np
+import soundfile as sf
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from cache import AnalysisCache, MemoryCache
+from analyzer import save_audio_analysis, analysis_cache_key
+
+def test_save_audio_analysis_uses_cache(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    audio_path = tmp_path / "test_audio.wav"
+    sr = 22050
+    sf.write(audio_path, np.random.randn(sr).astype(np.float32), sr)
+    first_folder = tmp_path / "first"
+    second_folder = tmp_path / "second"
+    first_folder.mkdir()
+    second_folder.mkdir()
+
+    metrics = save_audio_analysis(audio_path, first_folder, stage='original', cache=cache)
+    key = analysis_cache_key(cache, audio_path, streaming=False)
+    assert cache.get(key) is not None
+
+    cached_metrics = save_audio_analysis(audio_path, second_folder, stage='original', cache=cache)
+    assert cached_metrics.keys() == metrics.keys()
+    assert (second_folder / "test_audio_original_metrics.txt").exists()
+    assert (second_folder / "test_audio_original_spectrogram.png").exists()
+
+def test_cache_lru_eviction(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=150)
+    spectrogram_file = tmp_path / "spectrogram.png"
+    spectrogram_file.write_bytes(b"x" * 100)
+    cache.put("first", {'RMS Desvio': 0.1}, spectrogram_file)
+    cache.put("second", {'RMS Desvio': 0.2}, spectrogram_file)
+    assert cache.get("first") is None
+    assert cache.get("second")[0] == {'RMS Desvio': 0.2}
+
+def test_memory_cache_keys_and_byte_eviction():
+    cache = MemoryCache(max_bytes=250, max_entries=10)
+    calls = []
+    def compute(name, size):
+        calls.append(name)
+        return np.zeros(size, dtype=np.uint8)
+
+    first = cache.get_or_compute(('peaks', 'a'), lambda: compute('a', 100))
+    assert cache.get_or_compute(('peaks', 'a'), lambda: compute('a', 100)) is first
+    cache.get_or_compute(('waveform', 'a', 0.0, 1.0), lambda: compute('zoom', 100))
+    assert calls == ['a', 'zoom']
+
+    # 'a' foi usada por último: a imagem sai primeiro quando o limite de bytes passa
+    cache.get_or_compute(('peaks', 'a'), lambda: compute('a', 100))
+    cache.get_or_compute(('peaks', 'b'), lambda: compute('b', 100))
+    assert len(cache) == 2 and cache.nbytes == 200
+    cache.get_or_compute(('waveform', 'a', 0.0, 1.0), lambda: compute('zoom', 100))
+    cache.get_or_compute(('peaks', 'a'), lambda: compute('a', 100))
+    assert calls == ['a', 'zoom', 'b', 'zoom', 'a']
+
+    # Uma entrada maior que o limite fica sozinha no cache
+    cache.get_or_compute('big', lambda: compute('big', 1000))
+    assert len(cache) == 1 and cache.nbytes == 1000
+
+def test_uploads_share_the_lru(tmp_path):
+    from waveform import load_peaks, peaks_path
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=100000)
+    sr = 8000
+    buffer = tmp_path / "upload.wav"
+    sf.write(buffer, np.zeros(sr, dtype=np.int16), sr, subtype='PCM_16')
+    data = buffer.read_bytes()
+
+    first = cache.put_upload('a', data, '.wav')
+    assert cache.put_upload('a', data, '.wav') == first
+    load_peaks(first)
+    assert os.path.exists(peaks_path(first))
+
+    # Outro upload passa do limite: o mais antigo sai com a pirâmide de picos
+    second = cache.put_upload('b', data + b'\0' * 90000, '.wav')
+    assert os.path.exists(second)
+    assert not os.path.exists(first) and not os.path.exists(peaks_path(first))
@@ -0,0 +1,87 @@
+import sys
+import os
+import numpy as np
+import soundfile as sf
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from cli import main, select_files
+
+def test_select_files(tmp_path):
+    for name in ["a.wav", "b.wav", "skip_c.wav", "d.mp3"]:
+        (tmp_path / name).write_bytes(b"")
+    selected = select_files(str(tmp_path), '.wav', include=[], exclude=['skip_*'])
+    assert [os.path.basename(path) for path in selected] == ["a.wav", "b.wav"]
+
+def test_cli_treat_and_analyze(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    sr = 22050
+    sf.write(staging / "test_audio.wav", np.random.randn(sr).astype(np.float32), sr)
+    (staging / "broken.wav").write_bytes(b"not a wav file")
+    folders = ['--videos', str(tmp_path / "videos"), '--staging', str(staging),
+               '--treated', str(tmp_path / "treated"), '--converted', str(tmp_path / "converted")]
+
+    assert main(['treat', '--jobs', '2', '--exclude', 'broken*'] + folders) == 0
+    assert (tmp_path / "treated" / "test_audio.mp3").exists()
+    assert main(['analyze', '--stage', 'original', '--jobs', '1'] + folders) == 1
+    assert (staging / "analysis" / "test_audio_original_spectrogram.png").exists()
+
+def test_cli_all_fused(tmp_path, monkeypatch):
+    from test_extractor import create_test_video
+    monkeypatch.chdir(tmp_path)
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    create_test_video(videos / "test_video.mp4")
+    folders = ['--videos', str(videos), '--staging', str(tmp_path / "staging"),
+               '--treated', str(tmp_path / "treated"), '--converted', str(tmp_path / "converted")]
+
+    assert main(['all', '--fused', '--jobs', '1'] + folders) == 0
+    assert (tmp_path / "treated" / "test_video.mp3").exists()
+    assert (tmp_path / "staging" / "analysis" / "test_video_original_spectrogram.png").exists()
+    assert not (tmp_path / "staging" / "test_video.wav").exists()
+
+def test_cli_watch_resumes_from_queue(tmp_path, monkeypatch, capsys):
+    from test_extractor import create_test_video
+    monkeypatch.chdir(tmp_path)
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    create_test_video(videos / "test_video.mp4")
+    folders = ['--videos', str(videos), '--staging', str(tmp_path / "staging"),
+               '--treated', str(tmp_path / "treated"), '--converted', str(tmp_path / "converted")]
+    queue = ['--queue', str(tmp_path / "queue.db")]
+
+    assert main(['watch', '--once', '--jobs', '1'] + folders + queue) == 0
+    treated = tmp_path / "treated" / "test_video.mp3"
+    assert treated.exists() and (tmp_path / "converted" / "test_video.mp3").exists()
+    assert (tmp_path / "treated" / "analysis" / "test_video_treated_spectrogram.png").exists()
+
+    # Segunda execução: nenhuma etapa concluída é refeita
+    mtime = treated.stat().st_mtime_ns
+    assert main(['watch', '--once', '--jobs', '1'] + folders + queue) == 0
+    assert treated.stat().st_mtime_ns == mtime
+
+    assert main(['queue-status'] + queue) == 0
+    output = capsys.readouterr().out
+    assert 'analyze:converted' in output and 'extract' in output
+
+def test_pipeline_skipped_extract_keeps_continuation(tmp_path):
+    from cli import Pipeline, output_path
+    folders = {name: str(tmp_path / name) for name in ('videos', 'staging', 'treated', 'converted')}
+    stages = {'extract', 'treat', 'convert', 'analyze'}
+    wav = output_path('video.mp4', folders['staging'], '.wav')
+    os.makedirs(folders['staging'])
+    sf.write(wav, np.zeros(8000, dtype=np.float32), 8000)
+    # Queda depois do tratamento e da conversão, antes da análise do original
+    for folder in ('treated', 'converted'):
+        os.makedirs(folders[folder])
+        open(output_path(wav, folders[folder], '.mp3'), 'wb').close()
+    result = {'input': 'video.mp4', 'output': wav, 'status': 'skipped'}
+
+    pipeline = Pipeline(1, stages, folders)
+    assert pipeline.next_steps('extract', result) == []
+    queued = Pipeline(1, stages, folders, queued=True)
+    assert queued.next_steps('extract', result) == [('treat', wav), ('convert', wav), ('analyze:original', wav)]
+    for p in (pipeline, queued):
+        p.threads.shutdown()
+        p.processes.shutdown()
@@ -0,0 +1,33 @@
+import sys
+import os
+import numpy as np
+import soundfile as sf
+import ffmpeg
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from cutter import cut_audio
+
+def test_cut_pcm_is_sample_accurate(tmp_path):
+    sr = 22050
+    y = (np.random.randn(sr * 10, 2) * 0.1).astype(np.float32)
+    audio_path = tmp_path / "test_audio.wav"
+    sf.write(audio_path, y, sr, subtype='PCM_16')
+
+    buffer = cut_audio(audio_path, 2.5, 4.0)
+    cut, cut_sr = sf.read(buffer)
+    reference, _ = sf.read(audio_path, start=int(2.5 * sr), stop=int(4.0 * sr))
+    assert cut_sr == sr
+    np.testing.assert_array_equal(cut, reference)
+
+def test_cut_compressed_copy_and_reencode(tmp_path):
+    sr = 44100
+    audio_path = tmp_path / "test_audio.mp3"
+    ffmpeg.input(f'sine=frequency=440:sample_rate={sr}:duration=20', f='lavfi').output(str(audio_path)).overwrite_output().run(quiet=True)
+
+    copied = cut_audio(audio_path, 5, 8)
+    assert copied.getvalue()[:3] in (b'ID3', b'\xff\xfb')
+    assert abs(sf.info(copied).duration - 3) < 0.1
+
+    exact, exact_sr = sf.read(cut_audio(audio_path, 5, 8, output_format='wav'))
+    assert exact_sr == sr
+    assert len(exact) == 3 * sr
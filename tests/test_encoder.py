@@ -0,0 +1,16 @@
+import sys
+import os
+import numpy as np
+import soundfile as sf
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from encoder import encode_audio
+
+def test_encode_audio_stereo(tmp_path):
+    sr = 44100
+    y = np.random.randn(sr * 2, 2).astype(np.float32) * 0.1
+    output_file = tmp_path / "output.mp3"
+    encode_audio(y, sr, output_file, bitrate='128k', chunk_size=4096)
+    info = sf.info(output_file)
+    assert info.channels == 2
+    assert abs(info.duration - 2.0) < 0.1
@@ -1,8 +1,11 @@
 import sys
 import os
+import numpy as np
+import soundfile as sf
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
-from enhancer import AudioProcessor
+from enhancer import AudioProcessor, design_bandpass
+from loudness import measure_loudness
 
 def test_enhance_audio(tmp_path):
     processor = AudioProcessor()
@@ -12,3 +15,85 @@ def test_enhance_audio(tmp_path):
     output_file = tmp_path / "output.mp3"
     processor.enhance_audio(y, sr, metrics, str(output_file))
     assert output_file.exists()
+
+def test_enhance_audio_vbr(tmp_path):
+    processor = AudioProcessor(vbr_quality=4)
+    sr = 22050
+    y = np.random.randn(sr).astype(np.float32)
+    metrics = {'Zero Crossing Rate': 0.1}
+    output_file = tmp_path / "output.mp3"
+    processor.enhance_audio(y, sr, metrics, str(output_file))
+    assert output_file.exists()
+    assert not (tmp_path / "output.wav").exists()
+
+def test_bandpass_filter_matches_cascade():
+    processor = AudioProcessor()
+    sr = 22050
+    y = np.random.randn(sr)
+    cascade = processor.lowpass_filter(processor.highpass_filter(y, 300, sr, order=4), 6000, sr, order=4)
+    fused = processor.bandpass_filter(y, 300, 6000, sr, order=4)
+    assert np.allclose(fused, cascade, atol=1e-6)
+    assert design_bandpass(sr, 300, 6000, 4) is design_bandpass(sr, 300, 6000, 4)
+
+def test_enhance_file_streaming_matches_in_memory(tmp_path):
+    processor = AudioProcessor(noise_reduction=False)
+    sr = 22050
+    y = np.random.randn(sr * 5).astype(np.float32) * 0.2
+    input_file = tmp_path / "input.wav"
+    sf.write(input_file, y, sr, subtype='FLOAT')
+    metrics = {'Zero Crossing Rate': 0.1}
+    expected = processor.process(y, sr, metrics)
+    blocks = list(processor.iter_enhanced_blocks(str(input_file), metrics, block_seconds=1.5))
+    assert len(blocks) == 4
+    assert np.allclose(np.concatenate(blocks), expected, atol=1e-6)
+
+    output_file = tmp_path / "output.mp3"
+    AudioProcessor().enhance_file_streaming(str(input_file), metrics, str(output_file), block_seconds=2)
+    assert output_file.exists()
+
+def test_loudness_normalization_streaming_matches_in_memory(tmp_path):
+    processor = AudioProcessor(noise_reduction=False, loudness_target=-23.0)
+    sr = 22050
+    y = np.random.randn(sr * 5).astype(np.float32) * 0.05
+    input_file = tmp_path / "input.wav"
+    sf.write(input_file, y, sr, subtype='FLOAT')
+    metrics = {'Zero Crossing Rate': 0.1}
+    expected = processor.process(y, sr, metrics)
+    assert abs(measure_loudness(expected, sr)[0] - (-23.0)) < 0.05
+    blocks = list(processor.iter_enhanced_blocks(str(input_file), metrics, block_seconds=1.5))
+    assert np.allclose(np.concatenate(blocks), expected, atol=1e-6)
+
+def test_loudness_normalization_with_gaps_and_noise_reduction(tmp_path):
+    # Rajadas de tom com pausas de ruído de fundo: o ganho tem de contar as
+    # pausas que passam das portas depois de amplificadas, nas duas versões.
+    # Sem margem do codificador, o teto de true peak não limita o ganho
+    processor = AudioProcessor(loudness_target=-23.0, encoder_headroom=0.0)
+    sr = 16000
+    t = np.arange(sr * 16) / sr
+    y = ((np.floor(t) % 2 == 0) * 0.001 * np.sin(2 * np.pi * 440 * t)
+         + 0.0002 * np.random.default_rng(0).standard_normal(len(t))).astype(np.float32)
+    input_file = tmp_path / "input.wav"
+    sf.write(input_file, y, sr, subtype='FLOAT')
+    metrics = {'Zero Crossing Rate': 0.1}
+
+    expected = processor.process(y, sr, metrics)
+    blocks = np.concatenate(list(processor.iter_enhanced_blocks(str(input_file), metrics, block_seconds=4)))
+    assert abs(measure_loudness(expected, sr)[0] - (-23.0)) < 0.05
+    assert abs(measure_loudness(blocks, sr)[0] - (-23.0)) < 0.05
+
+def test_loudness_normalization_stereo_respects_ceiling_after_encoding(tmp_path):
+    import librosa
+    sr = 44100
+    rng = np.random.default_rng(1)
+    t = np.arange(sr * 4) / sr
+    mono = 0.3 * rng.standard_normal(len(t)) * (1 + np.sin(2 * np.pi * 0.5 * t)) + 0.2 * np.sin(2 * np.pi * 440 * t)
+    # Leiaute do librosa (canais, amostras), com canais diferentes; sem a margem
+    # do codificador este sinal passa de -0,1 dBTP depois do MP3
+    y = np.stack([mono, 0.5 * mono[::-1]]).astype(np.float32)
+    output = str(tmp_path / "stereo.mp3")
+    # Alvo alto: o ganho é limitado pelo teto de true peak
+    AudioProcessor(noise_reduction=False, loudness_target=-5.0, true_peak_ceiling=-1.0).enhance_audio(y, sr, {}, output)
+    encoded, encoded_sr = librosa.load(output, sr=None, mono=False)
+    assert encoded.shape[0] == 2
+    _, true_peak = measure_loudness(encoded.T, encoded_sr)
+    assert true_peak <= -1.0
@@ -3,17 +3,12 @@ import os
 from moviepy.editor import ColorClip
 from moviepy.audio.AudioClip import AudioArrayClip
 import numpy as np
+import soundfile as sf
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
-from extractor import extract_audio
+from extractor import extract_audio, decode_audio
 
-def test_extract_audio(tmp_path):
-    input_folder = tmp_path / "videos"
-    output_folder = tmp_path / "output"
-    input_folder.mkdir()
-    output_folder.mkdir()
-    video_path = input_folder / "test_video.mp4"
-    
+def create_test_video(video_path):
     # Create a simple video with moviepy
     clip = ColorClip(size=(640, 480), color=(255, 0, 0)).set_duration(2)
     
@@ -29,6 +24,49 @@ def test_extract_audio(tmp_path):
     
     # Write the video file
     clip.write_videofile(str(video_path), codec="libx264", fps=24, audio_codec="aac")
+
+def test_extract_audio(tmp_path):
+    input_folder = tmp_path / "videos"
+    output_folder = tmp_path / "output"
+    input_folder.mkdir()
+    output_folder.mkdir()
+    video_path = input_folder / "test_video.mp4"
+    create_test_video(video_path)
     
     extract_audio(input_folder, output_folder)
     assert len(list(output_folder.glob("*.wav"))) > 0
+
+def test_extract_audio_incremental_with_format(tmp_path):
+    input_folder = tmp_path / "videos"
+    output_folder = tmp_path / "output"
+    input_folder.mkdir()
+    create_test_video(input_folder / "test_video.mp4")
+
+    results = extract_audio(input_folder, output_folder, max_workers=2, sample_rate=22050, channels=1, sample_format='f32')
+    assert [result['status'] for result in results] == ['ok']
+    info = sf.info(output_folder / "test_video.wav")
+    assert info.samplerate == 22050
+    assert info.channels == 1
+    assert info.subtype == 'FLOAT'
+
+    results = extract_audio(input_folder, output_folder, sample_rate=22050, channels=1, sample_format='f32')
+    assert [result['status'] for result in results] == ['skipped']
+
+    # Outras opções de saída: o WAV mais novo que o vídeo é extraído de novo
+    results = extract_audio(input_folder, output_folder, sample_rate=16000, channels=1, sample_format='s16')
+    assert [result['status'] for result in results] == ['ok']
+    info = sf.info(output_folder / "test_video.wav")
+    assert info.samplerate == 16000 and info.subtype == 'PCM_16'
+
+def test_decode_audio_matches_extracted_wav(tmp_path):
+    input_folder = tmp_path / "videos"
+    output_folder = tmp_path / "output"
+    input_folder.mkdir()
+    create_test_video(input_folder / "test_video.mp4")
+
+    y, sr = decode_audio(input_folder / "test_video.mp4")
+    extract_audio(input_folder, output_folder, channels=1, sample_format='f32')
+    reference, reference_sr = sf.read(output_folder / "test_video.wav", dtype='float32')
+    assert sr == reference_sr == 44100
+    assert y.dtype == np.float32 and y.ndim == 1
+    np.testing.assert_allclose(y, reference, atol=1e-6)
@@ -0,0 +1,53 @@
+import sys
+import os
+import json
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from instrumentation import span, enable_tracing, disable_tracing, read_spans, export_chrome_trace
+from enhancer import AudioProcessor
+
+def test_span_disabled_is_noop():
+    disable_tracing()
+    with span('stage', file='a.wav') as current:
+        current.set(extra=1)
+
+def test_spans_for_enhance_audio(tmp_path):
+    trace_file = tmp_path / "trace.jsonl"
+    enable_tracing(str(trace_file))
+    try:
+        sr = 22050
+        y = np.random.randn(sr).astype(np.float32)
+        AudioProcessor().enhance_audio(y, sr, {'Zero Crossing Rate': 0.1}, str(tmp_path / "output.mp3"))
+    finally:
+        disable_tracing()
+
+    spans = read_spans(trace_file)
+    names = [record['name'] for record in spans]
+    assert names == ['noise_reduction', 'equalization', 'compression', 'normalization', 'encode', 'enhance_audio']
+    assert all(record['parent'] == 'enhance_audio' for record in spans[:-1])
+    assert spans[-1]['wall_s'] >= sum(record['wall_s'] for record in spans[:-1])
+
+    chrome_trace = export_chrome_trace(trace_file, tmp_path / "trace.json")
+    with open(chrome_trace) as f:
+        events = json.load(f)['traceEvents']
+    assert len(events) == len(spans)
+    assert all(event['ph'] == 'X' for event in events)
+
+def test_span_counts_child_processes(tmp_path):
+    import subprocess
+    trace_file = tmp_path / "trace.jsonl"
+    enable_tracing(str(trace_file))
+    try:
+        with span('child'):
+            # Como o ffmpeg: CPU e escrita feitas por um processo filho
+            subprocess.run([sys.executable, '-c', f"open({str(tmp_path / 'out.bin')!r}, 'wb').write(bytes(1 << 20)); sum(range(3 * 10 ** 6))"],
+                           check=True)
+    finally:
+        disable_tracing()
+
+    record = read_spans(trace_file)[0]
+    assert record['children_cpu_s'] > 0
+    assert record['cpu_s'] < record['children_cpu_s']
+    if record['process_write_bytes'] is not None:
+        assert record['process_write_bytes'] >= 1 << 20
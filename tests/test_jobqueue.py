@@ -0,0 +1,43 @@
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from jobqueue import JobQueue
+
+def test_queue_claim_complete_and_dedup(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    video = tmp_path / "a.mp4"
+    video.write_bytes(b"video")
+    assert queue.enqueue('extract', str(video))
+    assert not queue.enqueue('extract', str(video))
+
+    job = queue.claim('w1', lease_seconds=60)
+    assert job['step'] == 'extract' and job['input'] == str(video)
+    assert queue.claim('w2', lease_seconds=60) is None
+    queue.complete(job['id'], output='a.wav', elapsed=1.0, next_jobs=[('treat', 'a.wav', '1:1'), ('convert', 'a.wav', '1:1')])
+
+    # Concluído não volta para a fila; o arquivo alterado gera outro job
+    assert not queue.enqueue('extract', str(video))
+    video.write_bytes(b"video alterado")
+    assert queue.enqueue('extract', str(video))
+    stats = queue.stats()
+    assert stats['extract']['done'] == 1 and stats['extract']['pending'] == 1
+    assert stats['extract']['throughput'] > 0
+    assert stats['treat']['pending'] == 1 and queue.depth() == 3
+
+def test_queue_expired_lease_and_retries(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    queue.enqueue('treat', 'a.wav', signature='1:1')
+
+    # Worker que caiu: o lease vence e outro worker retoma o job
+    first = queue.claim('w1', lease_seconds=0.01)
+    time.sleep(0.02)
+    second = queue.claim('w2', lease_seconds=60, max_attempts=3)
+    assert second['id'] == first['id'] and second['attempts'] == 2
+
+    queue.fail(second['id'], 'erro', max_attempts=3)
+    third = queue.claim('w2', lease_seconds=60, max_attempts=3)
+    queue.fail(third['id'], 'erro', max_attempts=3)
+    assert queue.claim('w2', lease_seconds=60, max_attempts=3) is None
+    assert queue.failures() == [('treat', os.path.abspath('a.wav'), 'erro')]
@@ -0,0 +1,51 @@
+import sys
+import os
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from loudness import LoudnessMeter, measure_loudness, loudness_gain
+
+def test_sine_reference_level():
+    # Seno de 997 Hz a -20 dBFS em 48 kHz: -20 LUFS por canal (anexo 1 da BS.1770)
+    sr = 48000
+    y = 10 ** (-20 / 20) * np.sin(2 * np.pi * 997 * np.arange(sr * 5) / sr)
+    integrated, true_peak = measure_loudness(y, sr)
+    assert abs(integrated - (-20.0 - 3.01)) < 0.1
+    assert abs(true_peak - (-20.0)) < 0.1
+    stereo, _ = measure_loudness(np.stack([y, y], axis=1), sr)
+    assert abs(stereo - integrated - 3.01) < 0.05
+
+def test_block_size_does_not_change_result():
+    sr = 44100
+    y = np.random.randn(sr * 6, 2) * np.linspace(0.01, 0.5, sr * 6)[:, None]
+    expected = measure_loudness(y, sr)
+    meter = LoudnessMeter(sr, channels=2)
+    for start in range(0, len(y), 10007):
+        meter.process(y[start:start + 10007])
+    assert np.isclose(meter.integrated_loudness(), expected[0])
+    assert np.isclose(meter.true_peak(), expected[1])
+
+    assert measure_loudness(np.zeros(sr), sr)[0] == float('-inf')
+    silence = LoudnessMeter(sr)
+    silence.process(np.zeros(sr))
+    assert loudness_gain(silence, -23.0) == 1.0
+
+def test_gain_regates_quiet_blocks():
+    # Rajadas de tom com pausas de ruído de fundo abaixo de -70 LUFS: depois do
+    # ganho, as pausas passam da porta absoluta e entram na medida
+    sr = 16000
+    rng = np.random.default_rng(0)
+    t = np.arange(sr * 20) / sr
+    bursts = (np.floor(t) % 2 == 0) * 0.001 * np.sin(2 * np.pi * 440 * t)
+    y = bursts + 0.0002 * rng.standard_normal(len(t))
+    meter = LoudnessMeter(sr)
+    meter.process(y)
+    gain = loudness_gain(meter, -23.0)
+    assert abs(measure_loudness(y * gain, sr)[0] - (-23.0)) < 0.02
+    assert np.isclose(meter.integrated_loudness(20 * np.log10(gain)), -23.0, atol=0.02)
+
+    # Sem espaço até o teto de true peak, o ganho para no teto
+    sine = 10 ** (-20 / 20) * np.sin(2 * np.pi * 997 * np.arange(sr * 2) / sr)
+    meter = LoudnessMeter(sr)
+    meter.process(sine)
+    assert abs(20 * np.log10(loudness_gain(meter, -3.0)) - (-1.0 - meter.true_peak())) < 1e-9
@@ -1,5 +1,6 @@
 import sys
 import os
+import subprocess
 import numpy as np
 import soundfile as sf
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
@@ -21,6 +22,21 @@ def test_treat_audio_concurrently(tmp_path):
     treat_audio_concurrently(input_folder, treated_folder, processor)
     assert len(list(treated_folder.glob("*.mp3"))) > 0
 
+def test_treat_audio_concurrently_results(tmp_path):
+    input_folder = tmp_path / "input"
+    treated_folder = tmp_path / "treated"
+    input_folder.mkdir()
+    treated_folder.mkdir()
+    sr = 22050
+    y = np.random.randn(sr).astype(np.float32)
+    sf.write(input_folder / "a_audio.wav", y, sr)
+    (input_folder / "b_broken.wav").write_bytes(b"not a wav file")
+    results = treat_audio_concurrently(input_folder, treated_folder, AudioProcessor(), mode='process', max_workers=2)
+    assert [os.path.basename(result['input']) for result in results] == ["a_audio.wav", "b_broken.wav"]
+    assert results[0]['status'] == 'ok'
+    assert results[1]['status'] == 'error'
+    assert results[1]['error']
+
 def test_convert_audio_to_mp3(tmp_path):
     input_folder = tmp_path / "input"
     converted_folder = tmp_path / "converted"
@@ -33,3 +49,36 @@ def test_convert_audio_to_mp3(tmp_path):
     sf.write(audio_path, y, sr)
     convert_audio_to_mp3(input_folder, converted_folder)
     assert len(list(converted_folder.glob("*.mp3"))) > 0
+
+def test_import_main_is_lazy():
+    # Importar main não deve carregar as dependências pesadas (ver benchmarks/startup.py)
+    src_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+    code = "import sys, main; print(','.join(m for m in ('noisereduce', 'scipy.signal', 'matplotlib', 'numba') if m in sys.modules))"
+    completed = subprocess.run([sys.executable, '-c', code], cwd=src_folder, capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == ''
+
+def test_fused_metrics_match_extracted(tmp_path):
+    from moviepy.editor import ColorClip
+    from moviepy.audio.AudioClip import AudioArrayClip
+    from extractor import extract_audio_file
+    from analyzer import save_audio_analysis
+    from main import process_video_fused
+    sr = 44100
+    t = np.arange(2 * sr) / sr
+    # Canais diferentes: a mixagem para mono precisa ser a mesma nos dois modos
+    stereo = np.column_stack([0.5 * np.sin(2 * np.pi * 440 * t), 0.1 * np.sin(2 * np.pi * 660 * t)])
+    video = str(tmp_path / "stereo.mp4")
+    ColorClip(size=(64, 64), color=(0, 0, 0)).set_duration(2).set_audio(AudioArrayClip(stereo, fps=sr)) \
+        .write_videofile(video, codec="libx264", fps=24, audio_codec="aac", logger=None)
+
+    (tmp_path / "staging").mkdir()
+    (tmp_path / "analysis").mkdir()
+    staging = str(tmp_path / "staging" / "stereo.wav")
+    extract_audio_file(video, staging, sample_format='f32')
+    expected = save_audio_analysis(staging, str(tmp_path / "analysis"), write_txt=False)
+
+    result = process_video_fused(AudioProcessor(), video, str(tmp_path / "fused" / "stereo.wav"), str(tmp_path / "stereo.mp3"))
+    assert result['status'] == 'ok'
+    assert result['input'] == video
+    for key, value in expected.items():
+        assert np.isclose(result['metrics'][key], value, rtol=1e-4, atol=1e-4), key
@@ -0,0 +1,26 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from metrics_store import MetricsStore
+
+def test_append_many_and_query(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.db"))
+    store.append_many([
+        ("a.mp3", "treated", {'Spectral Flatness': 0.5, 'RMS Desvio': 0.1}),
+        ("b.mp3", "treated", {'Spectral Flatness': 0.1, 'RMS Desvio': 0.2}),
+        ("a.wav", "original", {'Spectral Flatness': 0.7, 'RMS Desvio': 0.3}),
+    ])
+    rows = store.query(stage="treated", where=[('Spectral Flatness', '>', 0.3)])
+    assert [os.path.basename(row['file']) for row in rows] == ["a.mp3"]
+    assert rows[0]['RMS Desvio'] == 0.1
+    assert store.query(where=[('Unknown Metric', '>', 0)]) == []
+
+def test_export_txt(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.db"))
+    store.append("a.wav", "original", {'Zero Crossing Rate': 0.25})
+    store.append("a.wav", "original", {'Zero Crossing Rate': 0.5})
+    output_file = tmp_path / "a_original_metrics.txt"
+    assert store.export_txt("a.wav", "original", output_file)
+    assert output_file.read_text() == "Zero Crossing Rate: 0.5\n"
+    assert not store.export_txt("missing.wav", "original", tmp_path / "missing.txt")
@@ -0,0 +1,39 @@
+import sys
+import os
+import numpy as np
+import soundfile as sf
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from program import ProgramAssembler
+
+def write_items(tmp_path, lengths, sr):
+    paths = []
+    for i, length in enumerate(lengths):
+        path = str(tmp_path / f"item_{i}.wav")
+        sf.write(path, (np.random.randn(int(length * sr), 2) * 0.1).astype(np.float32), sr, subtype='FLOAT')
+        paths.append(path)
+    return paths
+
+def test_assemble_matches_concatenation(tmp_path):
+    sr = 8000
+    paths = write_items(tmp_path, [1.0, 0.5, 2.0], sr)
+    assembler = ProgramAssembler(sample_rate=sr)
+    program = assembler.assemble(paths)
+    expected = np.concatenate([sf.read(path, dtype='float32')[0] for path in paths])
+    np.testing.assert_array_equal(program, expected)
+
+    crossfaded = assembler.assemble(paths, crossfade=0.1)
+    assert len(crossfaded) == len(expected) - 2 * int(0.1 * sr)
+
+def test_incremental_edits_match_fresh_render(tmp_path):
+    sr = 8000
+    paths = write_items(tmp_path, [1.0, 0.3, 2.0, 0.7, 1.5], sr)
+    assembler = ProgramAssembler(sample_rate=sr)
+    assembler.assemble(paths, crossfade=0.2)
+    # Troca, remoção e inclusão: cada montagem reaproveita o começo da anterior
+    for edited in (paths[:2] + [paths[3], paths[2]] + paths[4:], paths[:1] + paths[2:], paths + [paths[1]]):
+        np.testing.assert_array_equal(assembler.assemble(edited, crossfade=0.2),
+                                      ProgramAssembler(sample_rate=sr).assemble(edited, crossfade=0.2))
+
+    wav = sf.read(assembler.render(paths, output_format='wav'))[0]
+    assert wav.shape == (int(5.5 * sr), 2)
@@ -0,0 +1,29 @@
+import sys
+import os
+import numpy as np
+import matplotlib.image as mpimg
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from analyzer import compute_spectrogram, generate_spectrogram
+from spectrogram import downsample
+
+def test_downsample_keeps_peaks():
+    S = np.zeros((1025, 5000), dtype=np.float32)
+    S[1000, 4321] = 1.0
+    reduced = downsample(S, width=100, height=64)
+    assert reduced.shape == (64, 100)
+    assert reduced.max() == 1.0
+    assert reduced[-1, 86] == 1.0
+
+def test_generate_spectrogram_renderers(tmp_path):
+    sr = 22050
+    y = np.sin(2 * np.pi * 440 * np.arange(3 * sr) / sr).astype(np.float32)
+    S = compute_spectrogram(y)
+
+    generate_spectrogram(y, sr, tmp_path / "fast.png", S=S, renderer='fast')
+    image = mpimg.imread(tmp_path / "fast.png")
+    assert image.shape[:2] == (512, S.shape[1])
+
+    for i in range(2):
+        generate_spectrogram(y, sr, tmp_path / f"figure_{i}.png", S=S, renderer='figure')
+    assert mpimg.imread(tmp_path / "figure_0.png").shape == mpimg.imread(tmp_path / "figure_1.png").shape
@@ -0,0 +1,37 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from suggester import ParameterSuggester, heuristic_parameters
+
+FEATURES = ['Zero Crossing Rate', 'Spectral Centroid', 'Spectral Bandwidth']
+
+def test_suggester_without_model_uses_heuristic(tmp_path):
+    suggester = ParameterSuggester(str(tmp_path / "missing.pkl"))
+    metrics = {'Zero Crossing Rate': 0.1, 'Spectral Centroid': 300.0, 'Spectral Bandwidth': 6000.0}
+    assert not suggester.warm()
+    assert suggester.suggest(metrics) == heuristic_parameters(metrics) == (0.55, 300, 6000)
+
+def test_suggester_batches_predictions_with_warm_model(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 1, (50, 3)) * [0.2, 2000, 8000], columns=FEATURES)
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, X['Zero Crossing Rate'] * 4)
+    model_path = str(tmp_path / "model.pkl")
+    joblib.dump(model, model_path)
+
+    suggester = ParameterSuggester(model_path)
+    assert suggester.warm()
+    loaded = suggester.model()
+    metrics = [dict(zip(FEATURES, row)) for row in X.values[:5]] + [{'Zero Crossing Rate': 0.1}]
+    suggestions = suggester.suggest_many(metrics)
+    assert suggester.model() is loaded
+
+    expected = np.clip(model.predict(X[:5]), 0.0, 1.0)
+    np.testing.assert_allclose([noise for noise, _, _ in suggestions[:5]], expected)
+    assert suggestions[0][1:] == heuristic_parameters(metrics[0])[1:]
+    # Sem as métricas do modelo, a sugestão é a heurística
+    assert suggestions[5] == heuristic_parameters(metrics[5])
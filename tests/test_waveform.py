@@ -0,0 +1,43 @@
+import sys
+import os
+import numpy as np
+import soundfile as sf
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from waveform import WaveformPeaks, load_peaks, peaks_path, sample_envelope, PEAK_SCALE
+
+def test_build_peaks_streaming(tmp_path):
+    sr = 22050
+    y = (0.8 * np.random.rand(sr * 30) - 0.4).astype(np.float32)
+    audio_path = str(tmp_path / "test_audio.wav")
+    sf.write(audio_path, y, sr, subtype='FLOAT')
+
+    # Blocos que não são múltiplos da coluna, para exercitar a sobra entre blocos
+    peaks = WaveformPeaks.build(audio_path, blocksize=10000)
+    assert peaks.frames == len(y)
+    mins, maxs = peaks.levels[0]
+    expected = np.round(y[:256 * 10].reshape(-1, 256).max(axis=1) * PEAK_SCALE)
+    np.testing.assert_array_equal(maxs[:10], expected)
+    assert len(peaks.levels[-1][0]) <= 1024
+
+    times, window_mins, window_maxs = peaks.window(0, 30, 500)
+    assert len(times) <= 500
+    assert np.isclose(window_maxs.max(), y.max(), atol=1e-4)
+    assert np.isclose(window_mins.min(), y.min(), atol=1e-4)
+    assert peaks.window(10, 10.1, 500) is None
+
+    times, envelope_mins, envelope_maxs = sample_envelope(y[sr * 10:sr * 11], sr, 10.0, 500)
+    assert len(times) == 500 and times[0] == 10.0
+
+def test_load_peaks_reuses_saved_pyramid(tmp_path):
+    sr = 8000
+    audio_path = str(tmp_path / "test_audio.wav")
+    sf.write(audio_path, np.random.randn(sr * 5).astype(np.float32) * 0.1, sr)
+
+    peaks = load_peaks(audio_path)
+    assert os.path.exists(peaks_path(audio_path))
+    loaded = load_peaks(audio_path)
+    assert loaded.sr == peaks.sr and loaded.frames == peaks.frames
+    for (a_min, a_max), (b_min, b_max) in zip(peaks.levels, loaded.levels):
+        np.testing.assert_array_equal(a_min, b_min)
+        np.testing.assert_array_equal(a_max, b_max)
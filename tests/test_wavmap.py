@@ -0,0 +1,43 @@
+import sys
+import os
+import numpy as np
+import soundfile as sf
+import librosa
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from wavmap import MappedWav, open_audio, load_audio
+
+def test_mapped_wav_matches_soundfile(tmp_path):
+    sr = 22050
+    y = np.clip(np.random.randn(sr * 2 + 7, 2) * 0.3, -1, 1)
+    for subtype in ['PCM_U8', 'PCM_16', 'PCM_24', 'PCM_32', 'FLOAT', 'DOUBLE']:
+        audio_path = str(tmp_path / f"{subtype}.wav")
+        sf.write(audio_path, y, sr, subtype=subtype)
+        reference, _ = sf.read(audio_path, dtype='float32', always_2d=True)
+
+        with open_audio(audio_path) as f:
+            assert isinstance(f, MappedWav)
+            assert (f.samplerate, f.channels, f.frames) == (sr, 2, len(y))
+            f.seek(1000)
+            np.testing.assert_array_equal(f.read(5000, dtype='float32'), reference[1000:6000])
+            f.seek(0)
+            np.testing.assert_array_equal(np.concatenate(list(f.blocks(4096, dtype='float32'))), reference)
+
+        for mono in (True, False):
+            expected, _ = librosa.load(audio_path, sr=None, mono=mono)
+            loaded, loaded_sr = load_audio(audio_path, mono=mono)
+            assert loaded_sr == sr
+            np.testing.assert_array_equal(loaded, expected)
+
+def test_compressed_input_falls_back(tmp_path):
+    sr = 22050
+    y = (np.random.randn(sr, 2) * 0.1).astype(np.float32)
+    audio_path = str(tmp_path / "test_audio.flac")
+    sf.write(audio_path, y, sr)
+
+    with open_audio(audio_path) as f:
+        assert not isinstance(f, MappedWav)
+    loaded, loaded_sr = load_audio(audio_path)
+    expected, _ = librosa.load(audio_path, sr=None)
+    assert loaded_sr == sr
+    np.testing.assert_array_equal(loaded, expected)